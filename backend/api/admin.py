@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Dict, Any, Optional
+import asyncio
+import hmac
+from ..core.config import ADMIN_API_TOKEN
+from ..models.base import SessionLocal
+from ..services.knowledge_snapshot import bump_version, knowledge_store
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow only callers presenting the configured admin token."""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    # Constant-time comparison so response timing does not leak the token
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+
+def _bump_and_reload() -> None:
+    db = SessionLocal()
+    try:
+        # Bumping the version makes every other worker pick up the change on its next check
+        bump_version(db)
+        knowledge_store.refresh(db)
+    finally:
+        db.close()
+
+@router.post("/knowledge/reload", dependencies=[Depends(require_admin)])
+async def reload_knowledge() -> Dict[str, Any]:
+    """Bump the catalog version and reload the in-memory knowledge snapshot."""
+    # The snapshot load and its listeners are blocking and may wait on the poller's refresh
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _bump_and_reload)
+    
+    return {"status": "success", "knowledge": knowledge_store.stats()}
@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Dict, Any
-from ..models.base import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, AsyncIterator, Optional, Set
+from ..models.base import AsyncSessionLocal, get_async_db
+from ..services.admission import Overloaded, admission_controller, user_rate_limiter
 from ..services.chat_service import ChatService
+from ..services.message_writer import message_writer
+from ..services.model_registry import model_registry
+from ..services.nlp_service import NLPService
 from ..models.user import User
 from pydantic import BaseModel
+import json
+import logging
+import math
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Users already verified by this process; skips the User lookup on later turns
+_known_user_ids: Set[int] = set()
+_MAX_KNOWN_USERS = 100000
+
+# Seconds a client is asked to wait while the models are still loading
+_STARTING_RETRY_AFTER = 5
+
 class MessageRequest(BaseModel):
     text: str
     user_id: int
@@ -15,67 +33,308 @@ class MessageRequest(BaseModel):
 class MessageResponse(BaseModel):
     response: Dict[str, Any]
     conversation_id: int
+    user_message_id: Optional[int] = None
+    bot_message_id: Optional[int] = None
+
+async def _verify_user(db: AsyncSession, user_id: int) -> bool:
+    """Check that a user exists, remembering users already seen by this process."""
+    if user_id in _known_user_ids:
+        return True
+    user = await db.get(User, user_id)
+    if not user:
+        return False
+    if len(_known_user_ids) >= _MAX_KNOWN_USERS:
+        _known_user_ids.clear()
+    _known_user_ids.add(user_id)
+    return True
+
+def _rate_limit_wait(user_id: int) -> Optional[int]:
+    """Seconds the user must wait before sending another message, or None if allowed."""
+    wait = user_rate_limiter.acquire(user_id)
+    return None if wait is None else max(1, math.ceil(wait))
+
+def _check_rate_limit(user_id: int) -> None:
+    retry_after = _rate_limit_wait(user_id)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many messages; please slow down",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+def _ready_nlp_service(app) -> Optional[NLPService]:
+    """The shared NLP service once the models are loaded and warm, never building it here.
+    
+    Building it takes the registry lock and loads the models, which would
+    block the event loop, so requests during startup (or after a failed
+    load) are turned away instead.
+    """
+    if not getattr(app.state, "models_ready", False):
+        return None
+    return model_registry.loaded_nlp_service()
+
+def require_nlp_service(request: Request) -> NLPService:
+    nlp_service = _ready_nlp_service(request.app)
+    if nlp_service is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is starting up; please try again shortly",
+            headers={"Retry-After": str(_STARTING_RETRY_AFTER)}
+        )
+    return nlp_service
+
+def _overloaded(exc: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The assistant is busy; please try again shortly",
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 @router.post("/message", response_model=MessageResponse)
 async def process_message(
     request: MessageRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    nlp_service: NLPService = Depends(require_nlp_service)
 ) -> MessageResponse:
-    """Process a user message and return a response."""
+    """Process a user message and return a response.
+    
+    Answers 429 when the user exceeds their rate limit and 503 when the
+    inference queue is full or the models are still loading, all with a
+    Retry-After header.
+    """
+    _check_rate_limit(request.user_id)
+    
     # Verify user exists
-    user = db.query(User).filter(User.id == request.user_id).first()
-    if not user:
+    if not await _verify_user(db, request.user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
-    chat_service = ChatService(db)
-    result = chat_service.process_message(request.user_id, request.text)
+    chat_service = ChatService(db, nlp_service)
+    try:
+        async with admission_controller.admit():
+            result = await chat_service.process_message(request.user_id, request.text)
+    except Overloaded as exc:
+        raise _overloaded(exc)
     
     return MessageResponse(
         response=result["response"],
-        conversation_id=result["conversation_id"]
+        conversation_id=result["conversation_id"],
+        user_message_id=result["user_message_id"],
+        bot_message_id=result["bot_message_id"]
+    )
+
+@router.websocket("/ws/{user_id}")
+async def chat_socket(websocket: WebSocket, user_id: int) -> None:
+    """Carry a whole conversation over one WebSocket.
+    
+    The client sends ``{"text": ...}`` frames. Each one is answered with a
+    ``typing`` event as soon as the intent is classified, followed by the
+    ``message`` event holding the same fields as ``POST /message``. The user
+    is verified once per connection, and the active session stays warm in
+    the session table between turns. While the models are loading the
+    socket is closed with 1013 (try again later).
+    """
+    nlp_service = _ready_nlp_service(websocket.app)
+    if nlp_service is None:
+        await websocket.close(code=1013)
+        return
+    
+    async with AsyncSessionLocal() as db:
+        known = await _verify_user(db, user_id)
+    if not known:
+        await websocket.close(code=4404)
+        return
+    
+    await websocket.accept()
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            text = payload.get("text") if isinstance(payload, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                await websocket.send_json({"event": "error", "detail": "Message text is required"})
+                continue
+            
+            retry_after = _rate_limit_wait(user_id)
+            if retry_after is not None:
+                await websocket.send_json({
+                    "event": "error", "status": 429, "detail": "Too many messages; please slow down",
+                    "retry_after": retry_after
+                })
+                continue
+            
+            # Short-lived session per turn so idle sockets never pin a pooled connection
+            try:
+                async with admission_controller.admit(), AsyncSessionLocal() as db:
+                    async for event in ChatService(db, nlp_service).stream_message(user_id, text):
+                        await websocket.send_json(event)
+            except Overloaded as exc:
+                await websocket.send_json({
+                    "event": "error", "status": 503, "detail": "The assistant is busy; please try again shortly",
+                    "retry_after": exc.retry_after
+                })
+            except WebSocketDisconnect:
+                raise
+            except Exception:
+                logger.exception("Failed to process streamed message for user %s", user_id)
+                await websocket.send_json({"event": "error", "detail": "Failed to process message"})
+    except WebSocketDisconnect:
+        pass
+
+@router.get("/message/stream")
+async def stream_message(
+    user_id: int,
+    text: str = Query(..., min_length=1),
+    db: AsyncSession = Depends(get_async_db),
+    nlp_service: NLPService = Depends(require_nlp_service)
+) -> StreamingResponse:
+    """Server-Sent Events fallback for clients that cannot open a WebSocket.
+    
+    Emits the same ``typing`` and ``message`` events as the socket, one SSE
+    event each. A GET so that browsers can consume it with ``EventSource``.
+    Overload is reported as an ``error`` event with status 503, as on the
+    socket, because the slot is only taken once the stream starts.
+    """
+    _check_rate_limit(user_id)
+    if not await _verify_user(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return StreamingResponse(
+        _sse_events(nlp_service, user_id, text),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+def _sse_event(event: Dict[str, Any]) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+async def _sse_events(nlp_service: NLPService, user_id: int, text: str) -> AsyncIterator[str]:
+    # The slot is held only while the stream runs, so a stream that never starts holds none
+    try:
+        # Own session: the stream outlives the request-scoped one
+        async with admission_controller.admit(), AsyncSessionLocal() as stream_db:
+            async for event in ChatService(stream_db, nlp_service).stream_message(user_id, text):
+                yield _sse_event(event)
+    except Overloaded as exc:
+        yield _sse_event({
+            "event": "error", "status": 503, "detail": "The assistant is busy; please try again shortly",
+            "retry_after": exc.retry_after
+        })
+
+def _message_row(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "content": row.content,
+        "is_user": row.is_user,
+        "timestamp": row.timestamp.isoformat()
+    }
+
 @router.get("/conversation/{conversation_id}")
 async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db)
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
-    """Get the history of a conversation."""
+    """Get one page of a conversation's history.
+    
+    Pages are ordered oldest first and addressed by message id cursors:
+    pass ``after`` to read forward from a message or ``before`` to read
+    backward. Uses the (conversation_id, timestamp, id) index, so the cost
+    of a page does not depend on how long the conversation is.
+    """
     from ..models.user import Conversation, Message
     
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    
+    conversation = await db.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    messages = db.query(Message)\
-        .filter(Message.conversation_id == conversation_id)\
-        .order_by(Message.timestamp)\
-        .all()
+    # Make sure turns still waiting in the write-behind queue are visible
+    if message_writer.has_pending_conversation(conversation_id):
+        await message_writer.flush()
+    
+    sort_key = tuple_(Message.timestamp, Message.id)
+    query = select(Message.id, Message.content, Message.is_user, Message.timestamp)\
+        .filter(Message.conversation_id == conversation_id)
+    
+    cursor_id = before if before is not None else after
+    if cursor_id is not None:
+        cursor = (await db.execute(
+            select(Message.timestamp, Message.id)
+            .filter(Message.id == cursor_id, Message.conversation_id == conversation_id)
+        )).first()
+        if cursor is None:
+            raise HTTPException(status_code=400, detail="Cursor message not found in this conversation")
+        query = query.filter(sort_key < tuple_(*cursor) if before is not None else sort_key > tuple_(*cursor))
+    
+    # Fetch one extra row to learn whether another page exists
+    if before is not None:
+        rows = (await db.execute(
+            query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1)
+        )).all()
+        has_more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_older, has_newer = has_more, True
+    else:
+        rows = (await db.execute(
+            query.order_by(Message.timestamp, Message.id).limit(limit + 1)
+        )).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        has_older, has_newer = after is not None, has_more
     
     return {
         "conversation_id": conversation_id,
-        "messages": [
-            {
-                "id": msg.id,
-                "content": msg.content,
-                "is_user": msg.is_user,
-                "timestamp": msg.timestamp.isoformat()
-            }
-            for msg in messages
-        ]
+        "messages": [_message_row(row) for row in rows],
+        "next_after": rows[-1].id if rows and has_newer else None,
+        "prev_before": rows[0].id if rows and has_older else None
     }
 
+@router.get("/conversation/{conversation_id}/export")
+async def export_conversation(
+    conversation_id: int,
+    db: AsyncSession = Depends(get_async_db)
+) -> StreamingResponse:
+    """Stream a whole conversation as newline-delimited JSON in constant memory."""
+    from ..models.user import Conversation, Message
+    
+    conversation = await db.get(Conversation, conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    if message_writer.has_pending_conversation(conversation_id):
+        await message_writer.flush()
+    
+    async def rows():
+        # Own session: the stream outlives the request-scoped one
+        async with AsyncSessionLocal() as stream_db:
+            result = await stream_db.stream(
+                select(Message.id, Message.content, Message.is_user, Message.timestamp)
+                .filter(Message.conversation_id == conversation_id)
+                .order_by(Message.timestamp, Message.id)
+                .execution_options(yield_per=500)
+            )
+            async for partition in result.partitions():
+                yield "".join(json.dumps(_message_row(row)) + "\n" for row in partition)
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 @router.post("/feedback/{message_id}")
 async def submit_feedback(
     message_id: int,
     rating: int,
     comment: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Submit feedback for a specific message."""
     from ..models.user import Message, Feedback
     
-    message = db.query(Message).filter(Message.id == message_id).first()
+    if message_writer.is_pending(message_id):
+        await message_writer.flush()
+    
+    message = await db.get(Message, message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
@@ -89,6 +348,6 @@ async def submit_feedback(
     )
     
     db.add(feedback)
-    db.commit()
+    await db.commit()
     
     return {"status": "success", "message": "Feedback submitted successfully"} 
\ No newline at end of file
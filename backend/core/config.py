@@ -0,0 +1,112 @@
+from dotenv import load_dotenv
+from pathlib import Path
+import os
+
+load_dotenv()
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# Hugging Face model identifiers used by the NLP service
+INTENT_ENCODER_NAME = os.getenv("INTENT_ENCODER_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+NER_MODEL_NAME = os.getenv("NER_MODEL_NAME", "dbmdz/bert-large-cased-finetuned-conll03-english")
+
+# No-network startup: models must come from MODEL_ARTIFACT_DIR or the local Hugging Face cache
+NLP_OFFLINE = os.getenv("NLP_OFFLINE", "false").lower() == "true"
+if NLP_OFFLINE:
+    # Read by transformers and huggingface_hub when they are first imported
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# Model warm-up at application startup
+NLP_WARMUP_ON_STARTUP = os.getenv("NLP_WARMUP_ON_STARTUP", "true").lower() == "true"
+NLP_WARMUP_TEXT = os.getenv("NLP_WARMUP_TEXT", "Where is the library?")
+
+# Nearest-example intent index built from intents.json
+INTENT_INDEX_DIR = Path(os.getenv("INTENT_INDEX_DIR", str(DATA_DIR / "intent_index")))
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.45"))
+
+# Dynamic micro-batching of intent classification and NER inference
+NLP_BATCHING_ENABLED = os.getenv("NLP_BATCHING_ENABLED", "true").lower() == "true"
+NLP_BATCH_MAX_SIZE = int(os.getenv("NLP_BATCH_MAX_SIZE", "16"))
+NLP_BATCH_MAX_WAIT_MS = float(os.getenv("NLP_BATCH_MAX_WAIT_MS", "5"))
+
+# Use the transformer NER model only when the gazetteer finds no entities
+NER_FALLBACK_ENABLED = os.getenv("NER_FALLBACK_ENABLED", "true").lower() == "true"
+# When NER runs relative to intent classification: "sequential" skips it for intents that
+# need no NER labels, "concurrent" overlaps the two, "auto" overlaps them while at least
+# NLP_SPECULATIVE_NER_SHARE of recent messages needed NER
+NLP_PIPELINE_MODE = os.getenv("NLP_PIPELINE_MODE", "auto")
+NLP_SPECULATIVE_NER_SHARE = float(os.getenv("NLP_SPECULATIVE_NER_SHARE", "0.5"))
+# Run NER for every intent so its entities (incl. PER/MISC) always reach the stored conversation context
+NLP_CONTEXT_NER = os.getenv("NLP_CONTEXT_NER", "false").lower() == "true"
+
+# Inference backend: torch, torch-int8, onnx or onnx-int8
+NLP_BACKEND = os.getenv("NLP_BACKEND", "torch")
+MODEL_ARTIFACT_DIR = Path(os.getenv("MODEL_ARTIFACT_DIR", str(DATA_DIR / "models")))
+NLP_INTRA_OP_THREADS = int(os.getenv("NLP_INTRA_OP_THREADS", "0"))
+NLP_INTER_OP_THREADS = int(os.getenv("NLP_INTER_OP_THREADS", "0"))
+
+# Cache of NLP results keyed on normalized message text
+NLP_CACHE_ENABLED = os.getenv("NLP_CACHE_ENABLED", "true").lower() == "true"
+NLP_CACHE_MAX_ENTRIES = int(os.getenv("NLP_CACHE_MAX_ENTRIES", "4096"))
+NLP_CACHE_TTL_SECONDS = float(os.getenv("NLP_CACHE_TTL_SECONDS", "3600"))
+NLP_CACHE_REDIS_URL = os.getenv("NLP_CACHE_REDIS_URL")
+# Bump when model weights change under the same model name
+NLP_MODEL_VERSION = os.getenv("NLP_MODEL_VERSION", "1")
+
+# Shared secret for the admin API, sent in the X-Admin-Token header; empty disables the admin API
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Seconds between checks of the knowledge catalog version
+KNOWLEDGE_REFRESH_SECONDS = float(os.getenv("KNOWLEDGE_REFRESH_SECONDS", "60"))
+# Lowest trigram similarity (0-1) at which a misspelled name resolves to a knowledge record
+ENTITY_MATCH_MIN_SCORE = float(os.getenv("ENTITY_MATCH_MIN_SCORE", "0.55"))
+# Stricter similarity for misspelled names found by scanning a message the gazetteer matched nothing in
+ENTITY_SCAN_MIN_SCORE = float(os.getenv("ENTITY_SCAN_MIN_SCORE", "0.6"))
+# Knowledge records suggested when a question cannot be answered directly
+KNOWLEDGE_SEARCH_RESULTS = int(os.getenv("KNOWLEDGE_SEARCH_RESULTS", "3"))
+
+# Time zone event times are stored in, used to resolve "today" or "this weekend" (default: server local time)
+CAMPUS_TIMEZONE = os.getenv("CAMPUS_TIMEZONE")
+# Days ahead covered by "upcoming events", and how many events one answer lists
+EVENTS_LOOKAHEAD_DAYS = float(os.getenv("EVENTS_LOOKAHEAD_DAYS", "14"))
+EVENTS_MAX_RESULTS = int(os.getenv("EVENTS_MAX_RESULTS", "5"))
+
+# Threads that run blocking model inference off the event loop; with batching
+# enabled most of them simply wait on a batch, so this bounds in-flight requests
+NLP_EXECUTOR_WORKERS = int(os.getenv("NLP_EXECUTOR_WORKERS", "32"))
+
+# Admission control: chat turns running at once, turns allowed to wait, and how long they may wait
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(NLP_EXECUTOR_WORKERS)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+
+# Per-user token bucket in front of the chat endpoints
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "100000"))
+
+# Write-behind persistence of chat turns
+PERSISTENCE_WRITE_BEHIND = os.getenv("PERSISTENCE_WRITE_BEHIND", "true").lower() == "true"
+PERSISTENCE_MAX_BATCH = int(os.getenv("PERSISTENCE_MAX_BATCH", "200"))
+PERSISTENCE_MAX_DELAY_MS = float(os.getenv("PERSISTENCE_MAX_DELAY_MS", "50"))
+# Writes of one turn that may fail with a data error before it is dropped and logged
+PERSISTENCE_MAX_ATTEMPTS = int(os.getenv("PERSISTENCE_MAX_ATTEMPTS", "3"))
+
+# Sampled slow-request profiling: fraction of requests armed, and the dump threshold
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+
+# Active-session table: a new Conversation starts after this much inactivity
+CONVERSATION_INACTIVITY_MINUTES = float(os.getenv("CONVERSATION_INACTIVITY_MINUTES", "30"))
+SESSION_TABLE_MAX_ENTRIES = int(os.getenv("SESSION_TABLE_MAX_ENTRIES", "50000"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", str(CONVERSATION_INACTIVITY_MINUTES * 60)))
+
+# Prefork launcher (python -m backend.serve); 0 threads splits the usable cores evenly across workers.
+# One worker by default: session tables are per worker and nothing routes a user back to the same one.
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_THREADS_PER_WORKER = int(os.getenv("SERVER_THREADS_PER_WORKER", "0"))
+SERVER_MEMORY_REPORT_SECONDS = float(os.getenv("SERVER_MEMORY_REPORT_SECONDS", "300"))
@@ -0,0 +1,34 @@
+from typing import Dict, Optional
+import os
+
+_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_clean_bytes",
+    "Shared_Dirty": "shared_dirty_bytes",
+    "Private_Clean": "private_clean_bytes",
+    "Private_Dirty": "private_dirty_bytes"
+}
+
+def process_memory(pid: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """Resident, proportional and unique memory of a process from /proc/<pid>/smaps_rollup.
+
+    ``uss_bytes`` (private pages only) is what a forked worker costs on
+    top of the weights it shares with its parent. Returns None where
+    smaps_rollup is unavailable (non-Linux, or kernels before 4.14).
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    try:
+        with open(path, "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    memory = {"pid": pid or os.getpid()}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        name = _FIELDS.get(key)
+        if name is not None:
+            memory[name] = int(value.split()[0]) * 1024
+    memory["uss_bytes"] = memory.get("private_clean_bytes", 0) + memory.get("private_dirty_bytes", 0)
+    return memory
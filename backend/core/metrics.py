@@ -0,0 +1,106 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from prometheus_client import Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import time
+
+# Latency of each stage of a chat turn, labelled by the intent it resolved to
+STAGE_SECONDS = Histogram(
+    "chatbot_stage_seconds",
+    "Time spent in each stage of message processing",
+    ["stage", "intent"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+FLUSH_SECONDS = Histogram(
+    "chatbot_persistence_flush_seconds",
+    "Time spent writing one batch of chat turns",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+# Extra consumers of raw stage durations, e.g. the offline benchmark
+_stage_listeners: List[Callable[[str, str, float], None]] = []
+
+def add_stage_listener(listener: Callable[[str, str, float], None]) -> None:
+    """Call ``listener(stage, intent, seconds)`` for every observed stage duration."""
+    _stage_listeners.append(listener)
+
+class StageTimer:
+    """Times the stages of one message; durations are published once the intent is known."""
+
+    def __init__(self):
+        self.durations: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.append((name, time.perf_counter() - started))
+
+    def observe(self, intent: str) -> None:
+        for name, seconds in self.durations:
+            STAGE_SECONDS.labels(stage=name, intent=intent).observe(seconds)
+            for listener in _stage_listeners:
+                listener(name, intent, seconds)
+        self.durations = []
+
+def _pool_gauges(engines: Dict[str, Any]) -> List[GaugeMetricFamily]:
+    families = {
+        "size": GaugeMetricFamily("chatbot_db_pool_size", "Configured connection pool size", labels=["engine"]),
+        "checkedout": GaugeMetricFamily("chatbot_db_pool_checked_out", "Connections in use", labels=["engine"]),
+        "checkedin": GaugeMetricFamily("chatbot_db_pool_checked_in", "Idle connections in the pool", labels=["engine"]),
+        "overflow": GaugeMetricFamily("chatbot_db_pool_overflow", "Connections opened beyond the pool size", labels=["engine"])
+    }
+    for engine_name, engine in engines.items():
+        pool = engine.pool
+        for attribute, family in families.items():
+            # Only QueuePool-style pools expose these counters (not SQLite's)
+            reader = getattr(pool, attribute, None)
+            if callable(reader):
+                family.add_metric([engine_name], reader())
+    return list(families.values())
+
+class ChatbotCollector:
+    """Publishes the stats dictionaries of the chatbot services in Prometheus format."""
+
+    def __init__(self, engines: Dict[str, Any], sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]]):
+        self.engines = engines
+        self.sources = sources
+
+    def collect(self):
+        yield from _pool_gauges(self.engines)
+
+        for name, source in self.sources.items():
+            stats = source()
+            if not stats:
+                continue
+            yield from _flatten(f"chatbot_{name}", stats)
+
+def _flatten(prefix: str, stats: Dict[str, Any]):
+    """Turn numeric leaves of a nested stats dict into gauges and ``{int: count}`` maps into labelled counters."""
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            if value and all(isinstance(k, int) for k in value):
+                # Histogram-like {size: count} maps become one labelled counter
+                family = CounterMetricFamily(name, f"{key} by bucket", labels=["bucket"])
+                for bucket, count in value.items():
+                    family.add_metric([str(bucket)], count)
+                yield family
+            else:
+                yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield GaugeMetricFamily(name, key, value=1.0 if value else 0.0)
+        elif isinstance(value, (int, float)):
+            yield GaugeMetricFamily(name, key, value=float(value))
+
+_collector: Optional[ChatbotCollector] = None
+
+def register_collector(engines: Dict[str, Any], sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]]) -> None:
+    """Register the service stats collector once per process."""
+    global _collector
+    if _collector is None:
+        _collector = ChatbotCollector(engines, sources)
+        REGISTRY.register(_collector)
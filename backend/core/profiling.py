@@ -0,0 +1,42 @@
+import logging
+import random
+import sys
+import threading
+import traceback
+
+logger = logging.getLogger(__name__)
+
+def dump_thread_stacks(reason: str) -> None:
+    """Log the current stack of every thread in the process."""
+    frames = sys._current_frames()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = [f"Thread stacks ({reason}):"]
+    for ident, frame in frames.items():
+        lines.append(f"--- {names.get(ident, ident)}")
+        lines.extend(line.rstrip() for line in traceback.format_stack(frame))
+    logger.warning("\n".join(lines))
+
+class SlowRequestProfiler:
+    """Samples requests and dumps all thread stacks when a sampled one runs too long.
+
+    The dump happens while the request is still in flight, so it shows what
+    the event loop and the inference threads are busy with at that moment.
+    """
+
+    def __init__(self, sample_rate: float, slow_ms: float):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000.0
+        self.dumps = 0
+
+    def start(self, label: str):
+        """Arm a timer for a request; returns None when the request is not sampled."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        timer = threading.Timer(self.slow_seconds, self._dump, args=(label,))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _dump(self, label: str) -> None:
+        self.dumps += 1
+        dump_thread_stacks(f"{label} exceeded {self.slow_seconds * 1000:.0f}ms")
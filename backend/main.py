@@ -1,15 +1,133 @@
-from fastapi import FastAPI
+import time
+
+# Measured from here so the import cost of the app itself is logged at startup
+_IMPORTS_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from contextlib import asynccontextmanager, contextmanager
 from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Dict
+import asyncio
+import logging
 import os
+from .api import admin, chat
+from .core.config import (
+    KNOWLEDGE_REFRESH_SECONDS,
+    NLP_WARMUP_ON_STARTUP,
+    NLP_WARMUP_TEXT,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_MS
+)
+from .core.memory import process_memory
+from .core.metrics import register_collector
+from .core.profiling import SlowRequestProfiler
+from .models.base import SessionLocal, async_engine, engine
+from .services.admission import admission_controller, admission_stats
+from .services.inference_executor import shutdown_inference_executor
+from .services.knowledge_snapshot import KnowledgeSnapshot, knowledge_store
+from .services.message_writer import message_writer
+from .services.session_table import session_table
+from .services.model_registry import model_registry
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Seconds spent in each startup phase, reported by /ready
+startup_phases: Dict[str, float] = {"imports": time.perf_counter() - _IMPORTS_STARTED}
+
+@contextmanager
+def startup_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = time.perf_counter() - started
+        logger.info("Startup phase %s took %.2fs", name, startup_phases[name])
+
+def refresh_knowledge(force: bool = False) -> None:
+    """Load the knowledge snapshot, or reload it if the catalog version changed."""
+    db = SessionLocal()
+    try:
+        if force:
+            knowledge_store.refresh(db)
+        else:
+            knowledge_store.refresh_if_stale(db)
+    except SQLAlchemyError:
+        logger.warning("Could not load the knowledge snapshot", exc_info=True)
+    finally:
+        db.close()
+
+def publish_gazetteer_terms(snapshot: KnowledgeSnapshot) -> None:
+    """Add knowledge-base names to the shared entity gazetteer once the models are loaded."""
+    nlp_service = model_registry.loaded_nlp_service()
+    if nlp_service is not None:
+        nlp_service.load_knowledge_terms(snapshot.gazetteer_terms())
+
+def load_models() -> None:
+    """Build the shared NLP service with the current knowledge terms, then warm it up."""
+    with startup_phase("models"):
+        nlp_service = model_registry.get_nlp_service()
+        nlp_service.load_knowledge_terms(knowledge_store.snapshot.gazetteer_terms())
+    if NLP_WARMUP_ON_STARTUP:
+        with startup_phase("warmup"):
+            model_registry.warm_up(NLP_WARMUP_TEXT)
+    app.state.models_ready = True
+
+async def prepare_models() -> None:
+    """Load the models off the event loop, then follow catalog version changes."""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, load_models)
+    except Exception:
+        # Chat endpoints keep answering 503 rather than loading the models on the event loop
+        app.state.models_failed = True
+        logger.exception("Loading the NLP models failed; /ready will keep reporting not ready")
+    else:
+        logger.info("Ready to serve %.2fs after import", time.perf_counter() - _IMPORTS_STARTED)
+    await poll_knowledge_version()
+
+async def poll_knowledge_version() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(KNOWLEDGE_REFRESH_SECONDS)
+        await loop.run_in_executor(None, refresh_knowledge)
+
+async def evict_idle_sessions() -> None:
+    while True:
+        await asyncio.sleep(60)
+        session_table.evict_idle()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    app.state.models_ready = False
+    app.state.models_failed = False
+    knowledge_store.on_refresh(publish_gazetteer_terms)
+    with startup_phase("knowledge"):
+        await loop.run_in_executor(None, refresh_knowledge, True)
+    # Models load and warm in the background; /ready flips once they are done
+    models = asyncio.create_task(prepare_models())
+    session_evictor = asyncio.create_task(evict_idle_sessions())
+    message_writer.start()
+    yield
+    models.cancel()
+    session_evictor.cancel()
+    # Durably write every queued chat turn before the process exits
+    await message_writer.stop()
+    shutdown_inference_executor()
+    admission_controller.reset()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="TAMU-CC Chatbot API",
     description="API for the TAMU-CC AI Chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,14 +139,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+profiler = SlowRequestProfiler(PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS)
+
+async def profile_slow_requests(request: Request, call_next):
+    timer = profiler.start(f"{request.method} {request.url.path}")
+    try:
+        return await call_next(request)
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+# HTTP middleware costs every request a task hop, so it is only installed when sampling
+if PROFILE_SAMPLE_RATE > 0:
+    app.middleware("http")(profile_slow_requests)
+
+register_collector(
+    {"sync": engine, "async": async_engine.sync_engine},
+    {
+        "nlp_batching": lambda: model_registry.status()["batching"],
+        "nlp_cache": lambda: model_registry.status()["cache"],
+        "nlp_pipeline": lambda: model_registry.status()["pipeline"],
+        "knowledge": knowledge_store.stats,
+        "persistence": message_writer.stats,
+        "sessions": session_table.stats,
+        "admission": admission_stats,
+        "memory": process_memory
+    }
+)
+
+app.include_router(chat.router, prefix="/api")
+app.include_router(admin.router, prefix="/api/admin")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the TAMU-CC Chatbot API"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "models": model_registry.status(),
+        "knowledge": knowledge_store.stats(),
+        "persistence": message_writer.stats(),
+        "sessions": session_table.stats(),
+        "admission": admission_stats(),
+        "memory": process_memory()
+    }
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 200 only once the models are loaded and warm and the catalog is loaded."""
+    ready = getattr(app.state, "models_ready", False) and knowledge_store.refreshes > 0
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "models": "failed" if getattr(app.state, "models_failed", False) else model_registry.status()["state"],
+        "knowledge_version": knowledge_store.snapshot.version,
+        "startup_seconds": dict(startup_phases)
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
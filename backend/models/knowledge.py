@@ -73,4 +73,11 @@ class Service(Base):
     location = Column(String)
     contact_info = Column(String)
     hours = Column(String)
-    category = Column(String) 
\ No newline at end of file
+    category = Column(String)
+
+class KnowledgeVersion(Base):
+    __tablename__ = "knowledge_version"
+
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, default=1)  # Bumped whenever the catalog is edited
+    updated_at = Column(DateTime)
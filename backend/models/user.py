@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 from datetime import datetime
@@ -35,6 +35,12 @@ class Message(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Serves keyset pagination and ordered export of a conversation's history.
+    # Not created on existing databases; see the README for the DDL.
+    __table_args__ = (
+        Index("ix_messages_conversation_timestamp_id", "conversation_id", "timestamp", "id"),
+    )
+
 class Feedback(Base):
     __tablename__ = "feedback"
 
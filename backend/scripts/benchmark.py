@@ -0,0 +1,302 @@
+"""Offline benchmark of the chat pipeline through the FastAPI app.
+
+Usage: python -m backend.scripts.benchmark [--models stub|real] [--concurrency 1,8,32]
+                                          [--messages 500] [--output results.json]
+
+Runs entirely on one machine. By default a scratch SQLite database is
+created and seeded with synthetic knowledge rows. Pass --database-url to
+point at a local Postgres instead; it is seeded only if it has no users.
+The workload is built from the intents.json examples. "stub" models use a
+deterministic hashed bag-of-words encoder and an empty NER, so only the
+serving stack is measured. "real" loads the configured models from the
+local cache with the Hugging Face hub offline.
+
+For each concurrency level the report includes messages/sec, end-to-end
+and per-stage latency percentiles, and peak RSS. It is written as JSON,
+so runs on different commits can be diffed.
+"""
+from typing import Dict, Any, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+class StubEncoder:
+    """Deterministic hashed bag-of-words sentence encoder; needs no model files."""
+
+    model_name = "benchmark-stub"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def encode(self, texts: List[str]):
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[row, zlib.crc32(token.strip("?.,!").encode("utf-8")) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+def stub_ner(texts, batch_size: Optional[int] = None):
+    """NER stand-in that never finds entities, matching the pipeline call shape."""
+    if isinstance(texts, str):
+        return []
+    return [[] for _ in texts]
+
+def build_workload(size: int, seed: int) -> List[str]:
+    """Intents.json examples, shuffled deterministically and repeated to ``size``."""
+    with open(DATA_DIR / "intents.json", "r") as f:
+        intents = json.load(f)
+    examples = [
+        example
+        for definition in intents.get("intents", {}).values()
+        for example in definition.get("examples", [])
+    ]
+    rng = random.Random(seed)
+    workload = []
+    while len(workload) < size:
+        batch = list(examples)
+        rng.shuffle(batch)
+        workload.extend(batch)
+    return workload[:size]
+
+def seed_database(users: int, scale: int, seed: int) -> Dict[str, int]:
+    """Create the tables and insert synthetic knowledge rows unless users already exist."""
+    from ..models.base import Base, SessionLocal, engine
+    from ..models.knowledge import Building, Department, Event, Faculty, Program, Service
+    from ..models.user import User
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        if db.query(User).first() is not None:
+            return {"seeded": 0}
+
+        with open(DATA_DIR / "entities.json", "r") as f:
+            entities = json.load(f).get("entities", {})
+        rng = random.Random(seed)
+
+        def names(label: str, prefix: str) -> List[str]:
+            # Real entity examples first so lookups hit, then synthetic rows up to scale
+            known = list(entities.get(label, {}).get("examples", []))
+            return known + [f"{prefix} {i}" for i in range(len(known), max(scale, len(known)))]
+
+        roles = entities.get("faculty_roles", {}).get("examples", []) or ["Professor"]
+        departments = [
+            Department(name=name, description=f"The {name} department.", location=f"Room {100 + i}",
+                       contact_info=f"dept{i}@example.edu")
+            for i, name in enumerate(names("departments", "Department"))
+        ]
+        db.add_all(departments)
+        db.flush()
+        for i, department in enumerate(departments):
+            for degree in ("BS", "MS"):
+                db.add(Program(name=f"{degree} in {department.name}", degree_type=degree,
+                               description=f"{degree} program {i}.", department_id=department.id))
+            for j, role in enumerate(roles[:3]):
+                member = Faculty(name=f"Dr. Faculty {i}-{j}", title=role, email=f"f{i}.{j}@example.edu",
+                                 office_location=f"Room {200 + j}", office_hours="MW 10-12")
+                member.departments.append(department)
+                db.add(member)
+
+        for i, name in enumerate(names("buildings", "Building")):
+            db.add(Building(name=name, code=f"B{i:03d}", location=f"{i} Campus Drive",
+                            description=f"{name}.", hours="7am-10pm"))
+        for i, name in enumerate(names("services", "Service")):
+            db.add(Service(name=name, description=f"{name} helps students.", location=f"Suite {i}",
+                           contact_info=f"svc{i}@example.edu", hours="8am-5pm", category="student"))
+
+        base = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0)
+        for i, title in enumerate(names("events", "Event")):
+            start = base + timedelta(days=rng.randint(0, 60), hours=rng.randint(0, 8))
+            db.add(Event(title=title, description=f"{title}.", location="University Center",
+                         start_time=start, end_time=start + timedelta(hours=2),
+                         organizer="Student Life", category="campus"))
+
+        for i in range(users):
+            db.add(User(id=i + 1, email=f"bench{i + 1}@example.edu"))
+        db.commit()
+        return {"seeded": 1, "users": users, "departments": len(departments)}
+    finally:
+        db.close()
+
+def install_stub_models() -> None:
+    """Register stub pipelines under the keys NLPService looks up."""
+    from ..core.config import INTENT_ENCODER_NAME, NER_MODEL_NAME, NLP_BACKEND
+    from ..services.model_registry import model_registry
+
+    model_registry.get_pipeline("feature-extraction", f"{INTENT_ENCODER_NAME}@{NLP_BACKEND}", StubEncoder)
+    model_registry.get_pipeline("ner", f"{NER_MODEL_NAME}@{NLP_BACKEND}", lambda: stub_ner)
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    from ..core.stats import percentile
+
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None
+    }
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+async def run_level(client, workload: List[str], concurrency: int, users: int,
+                    stage_samples: Dict[str, List[float]]) -> Dict[str, Any]:
+    """Send the whole workload with ``concurrency`` clients and summarize it."""
+    stage_samples.clear()
+    # Latencies per status, so fast 429/503 answers never flatter the 200 percentiles
+    latencies: Dict[int, List[float]] = defaultdict(list)
+    cursor = iter(enumerate(workload))
+
+    async def worker() -> None:
+        for position, text in cursor:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/message", json={"text": text, "user_id": position % users + 1}
+            )
+            latencies[response.status_code].append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    answered = len(latencies[200])
+    return {
+        "concurrency": concurrency,
+        "messages": len(workload),
+        "errors": len(workload) - answered,
+        "status_counts": {str(status): len(values) for status, values in sorted(latencies.items())},
+        "seconds": elapsed,
+        # Only answered messages count as throughput
+        "messages_per_second": answered / elapsed if elapsed else None,
+        "latency_ms": percentiles(latencies[200]),
+        "error_latency_ms": {
+            str(status): percentiles(values) for status, values in sorted(latencies.items()) if status != 200
+        },
+        "stage_ms": {stage: percentiles(values) for stage, values in sorted(stage_samples.items())},
+        "peak_rss_bytes": peak_rss_bytes()
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    from ..core.metrics import add_stage_listener
+    from ..main import app
+    from ..services.message_writer import message_writer
+    from ..services.model_registry import model_registry
+
+    stage_samples: Dict[str, List[float]] = defaultdict(list)
+    add_stage_listener(lambda stage, intent, seconds: stage_samples[stage].append(seconds * 1000))
+
+    workload = build_workload(args.messages, args.seed)
+    levels = []
+    # httpx does not run ASGI lifespan events, so enter the app's lifespan directly
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # Models load in the background after startup
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.1)
+            await run_level(client, build_workload(args.warmup, args.seed + 1), 1, args.users, stage_samples)
+            for concurrency in args.concurrency:
+                levels.append(await run_level(client, workload, concurrency, args.users, stage_samples))
+                await message_writer.flush()
+        models = model_registry.status()
+
+    return {
+        "levels": levels,
+        "models": {key: models[key] for key in ("loaded_models", "load_seconds", "warmup_seconds")},
+        "peak_rss_bytes": peak_rss_bytes()
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline offline.")
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--messages", type=int, default=500, help="messages per concurrency level")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed messages sent first")
+    parser.add_argument("--users", type=int, default=64, help="distinct users sending messages")
+    parser.add_argument("--scale", type=int, default=50, help="synthetic rows per knowledge table")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="keep the NLP result cache enabled")
+    parser.add_argument("--database-url", help="database to seed and use (default: scratch SQLite)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    scratch = tempfile.mkdtemp(prefix="chatbot-benchmark-")
+    # Configuration is read at import time, so set it before importing the app
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}/benchmark.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["NLP_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["PROFILE_SAMPLE_RATE"] = "0"
+    # Measure the pipeline, not load shedding: no per-user rate limit and room to queue every client
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["ADMISSION_MAX_QUEUE"] = str(max(args.concurrency, default=1))
+    os.environ["ADMISSION_QUEUE_TIMEOUT_MS"] = "600000"
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    if args.models == "stub":
+        # Keep the stub index away from the real one
+        os.environ["INTENT_INDEX_DIR"] = str(Path(scratch) / "intent_index")
+
+    seeding = seed_database(args.users, args.scale, args.seed)
+    if args.models == "stub":
+        install_stub_models()
+
+    results = asyncio.run(run_benchmark(args))
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "models": args.models,
+            "messages": args.messages,
+            "users": args.users,
+            "scale": args.scale,
+            "seed": args.seed,
+            "cache": args.cache,
+            "database": "sqlite" if args.database_url is None else args.database_url.split(":", 1)[0],
+            "seeding": seeding
+        },
+        **results
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
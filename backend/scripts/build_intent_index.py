@@ -0,0 +1,38 @@
+"""Rebuild the nearest-example intent index from backend/data/intents.json.
+
+Usage: python -m backend.scripts.build_intent_index [--output DIR] [--backend NAME]
+
+The index is tied to the backend it was built with, so build it with the
+NLP_BACKEND the server will run.
+"""
+from pathlib import Path
+import argparse
+import json
+from ..core.config import (
+    DATA_DIR,
+    INTENT_ENCODER_NAME,
+    INTENT_INDEX_DIR,
+    INTENT_CONFIDENCE_THRESHOLD,
+    MODEL_ARTIFACT_DIR,
+    NLP_BACKEND
+)
+from ..services.encoder import SentenceEncoder
+from ..services.intent_index import IntentIndex
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the intent example index")
+    parser.add_argument("--intents", type=Path, default=DATA_DIR / "intents.json")
+    parser.add_argument("--output", type=Path, default=INTENT_INDEX_DIR)
+    parser.add_argument("--encoder", default=INTENT_ENCODER_NAME)
+    parser.add_argument("--backend", default=NLP_BACKEND)
+    args = parser.parse_args()
+
+    with open(args.intents, "r") as f:
+        intents = json.load(f)
+
+    index = IntentIndex.build(intents, SentenceEncoder(args.encoder, args.backend, MODEL_ARTIFACT_DIR), INTENT_CONFIDENCE_THRESHOLD)
+    index.save(args.output)
+    print(f"Indexed {index.matrix.shape[0]} examples for {len(index.intent_names)} intents into {args.output}")
+
+if __name__ == "__main__":
+    main()
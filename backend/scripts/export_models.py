@@ -0,0 +1,99 @@
+"""Export the NLP models to optimized ONNX Runtime artifacts next to backend/data.
+
+Usage: python -m backend.scripts.export_models [--pin] [--skip-onnx] [--no-quantize] [--compare]
+
+With --pin, the torch tokenizer and weights are first saved under
+MODEL_ARTIFACT_DIR as well, so the torch backends start with NLP_OFFLINE=true.
+
+With --compare, every available backend is loaded and timed on the
+intents.json examples, reporting per-message latency and how often its
+intent predictions agree with eager torch.
+"""
+from typing import Dict, Any, List
+import argparse
+import json
+import time
+from ..core.config import (
+    DATA_DIR,
+    INTENT_ENCODER_NAME,
+    INTENT_CONFIDENCE_THRESHOLD,
+    MODEL_ARTIFACT_DIR,
+    NER_MODEL_NAME,
+    NLP_INTRA_OP_THREADS,
+    NLP_INTER_OP_THREADS
+)
+from ..services.encoder import SentenceEncoder
+from ..services.inference_backends import (
+    FEATURE_EXTRACTION,
+    SUPPORTED_BACKENDS,
+    TOKEN_CLASSIFICATION,
+    export_onnx,
+    pin_torch
+)
+from ..services.intent_index import IntentIndex
+
+def compare_backends(examples: List[str], intents: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Time the intent encoder on each backend and measure agreement with eager torch.
+
+    Each backend gets an index built from its own embeddings, as the server
+    does, since a persisted index is only reused with the backend that built it.
+    """
+    reference = None
+    report = []
+    for backend in SUPPORTED_BACKENDS:
+        try:
+            encoder = SentenceEncoder(
+                INTENT_ENCODER_NAME,
+                backend,
+                MODEL_ARTIFACT_DIR,
+                NLP_INTRA_OP_THREADS,
+                NLP_INTER_OP_THREADS
+            )
+        except RuntimeError as exc:
+            report.append({"backend": backend, "error": str(exc)})
+            continue
+
+        index = IntentIndex.build(intents, encoder, INTENT_CONFIDENCE_THRESHOLD)
+        encoder.encode(examples[:1])
+        started = time.perf_counter()
+        predictions = [index.classify(encoder.encode([text]))[0]["intent"] for text in examples]
+        elapsed = time.perf_counter() - started
+
+        if reference is None:
+            reference = predictions
+        agreement = sum(a == b for a, b in zip(predictions, reference)) / len(examples)
+        report.append({
+            "backend": backend,
+            "ms_per_message": elapsed * 1000 / len(examples),
+            "agreement_with_torch": agreement
+        })
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export NLP models for offline startup and the onnx backends")
+    parser.add_argument("--pin", action="store_true", help="save local torch copies for offline startup")
+    parser.add_argument("--skip-onnx", action="store_true", help="do not export the onnx backends")
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 ONNX copy")
+    parser.add_argument("--compare", action="store_true", help="benchmark every backend afterwards")
+    args = parser.parse_args()
+
+    for task, model_name in ((FEATURE_EXTRACTION, INTENT_ENCODER_NAME), (TOKEN_CLASSIFICATION, NER_MODEL_NAME)):
+        if args.pin:
+            print(f"Pinned {model_name} to {pin_torch(task, model_name, MODEL_ARTIFACT_DIR)}")
+        if args.skip_onnx:
+            continue
+        onnx_dir, int8_dir = export_onnx(task, model_name, MODEL_ARTIFACT_DIR, quantize=not args.no_quantize)
+        print(f"Exported {model_name} to {onnx_dir}" + (f" and {int8_dir}" if int8_dir else ""))
+
+    if args.compare:
+        with open(DATA_DIR / "intents.json", "r") as f:
+            intents = json.load(f)
+        examples = [
+            example
+            for definition in intents["intents"].values()
+            for example in definition.get("examples", [])
+        ]
+        print(json.dumps(compare_backends(examples, intents), indent=2))
+
+if __name__ == "__main__":
+    main()
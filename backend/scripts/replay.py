@@ -0,0 +1,333 @@
+"""Replay stored user messages through the current NLP models and score the results.
+
+Usage: python -m backend.scripts.replay OUTPUT_DIR [--workers N] [--chunk-size 2000]
+                                       [--batch-size 64] [--baseline DIR] [--restart]
+
+User messages are streamed out of the database in keyset-paginated chunks
+in (conversation, timestamp, id) order. Each message is paired with the bot
+reply that follows it and that reply's feedback rating. Chunks fan out to a
+process pool. Every worker loads the models once and runs batched
+inference, and each chunk is written as one Parquet part file under
+OUTPUT_DIR. A checkpoint is saved after every part, so an interrupted run
+picks up where it stopped.
+
+When the replay finishes, report.json is written next to the parts. It
+holds the intent distribution and feedback ratings per predicted intent.
+With --baseline, it also holds agreement with an earlier replay.
+
+Parquet output needs pyarrow, which is listed in requirements.txt.
+"""
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from sqlalchemy import func, select, tuple_
+from ..core.config import DATA_DIR, INTENT_ENCODER_NAME, NER_MODEL_NAME, NLP_BACKEND
+from ..core.stats import percentile
+from ..models.base import SessionLocal
+from ..models.user import Feedback, Message
+from ..services.intent_index import intents_fingerprint
+from ..services.knowledge_snapshot import KnowledgeSnapshot, read_version
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "_checkpoint.json"
+REPORT_FILE = "report.json"
+PART_PATTERN = "part-{:06d}.parquet"
+
+@dataclass
+class ReplayItem:
+    """One user message with the reply that followed it."""
+    message_id: int
+    conversation_id: int
+    timestamp: Optional[datetime]
+    text: str
+    reply_id: Optional[int] = None
+    rating: Optional[float] = None
+    rating_count: int = 0
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise RuntimeError(
+            "Replay output is written as Parquet and needs pyarrow; pip install -r requirements.txt"
+        ) from exc
+    return pyarrow, pyarrow.parquet
+
+def _cursor_key(item: ReplayItem) -> List[Any]:
+    return [item.conversation_id, item.timestamp.isoformat() if item.timestamp else None, item.message_id]
+
+def iter_chunks(chunk_size: int, cursor: Optional[List[Any]] = None) -> Iterator[List[ReplayItem]]:
+    """Yield user messages in chunks, each paired with its reply and feedback rating.
+
+    Rows are read by keyset over the (conversation_id, timestamp, id) index,
+    so every chunk costs the same however deep into the table it is. A user
+    message that ends a page waits for the next page to find its reply.
+    """
+    sort_key = tuple_(Message.conversation_id, Message.timestamp, Message.id)
+    if cursor is not None:
+        cursor = (cursor[0], datetime.fromisoformat(cursor[1]) if cursor[1] else None, cursor[2])
+
+    carried: Optional[ReplayItem] = None
+    with SessionLocal() as db:
+        while True:
+            query = select(Message.id, Message.conversation_id, Message.timestamp, Message.content, Message.is_user)
+            if cursor is not None:
+                query = query.filter(sort_key > tuple_(*cursor))
+            rows = db.execute(
+                query.order_by(Message.conversation_id, Message.timestamp, Message.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            cursor = (rows[-1].conversation_id, rows[-1].timestamp, rows[-1].id)
+
+            items: List[ReplayItem] = []
+            pending = carried
+            for row in rows:
+                if pending is not None and not row.is_user and row.conversation_id == pending.conversation_id:
+                    pending.reply_id = row.id
+                if row.is_user:
+                    if pending is not None:
+                        items.append(pending)
+                    pending = ReplayItem(row.id, row.conversation_id, row.timestamp, row.content or "")
+                elif pending is not None:
+                    items.append(pending)
+                    pending = None
+            carried = pending
+
+            _attach_ratings(db, items)
+            if items:
+                yield items
+            if len(rows) < chunk_size:
+                break
+
+    if carried is not None:
+        yield [carried]
+
+def _attach_ratings(db, items: List[ReplayItem]) -> None:
+    by_reply = {item.reply_id: item for item in items if item.reply_id is not None}
+    if not by_reply:
+        return
+    ratings = db.execute(
+        select(Feedback.message_id, func.avg(Feedback.rating), func.count(Feedback.id))
+        .filter(Feedback.message_id.in_(list(by_reply)))
+        .group_by(Feedback.message_id)
+    ).all()
+    for message_id, rating, count in ratings:
+        item = by_reply[message_id]
+        item.rating = float(rating) if rating is not None else None
+        item.rating_count = count
+
+# Per-process state of pool workers
+_worker_service = None
+
+def _init_worker(knowledge_terms: Dict[str, List[Tuple[str, str]]]) -> None:
+    """Load the models once per worker process."""
+    global _worker_service
+    from ..services.model_registry import get_nlp_service
+
+    _worker_service = get_nlp_service()
+    _worker_service.load_knowledge_terms(knowledge_terms)
+
+def _replay_chunk(texts: List[str], batch_size: int) -> Tuple[List[Dict[str, Any]], float]:
+    started = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    for start in range(0, len(texts), batch_size):
+        results.extend(_worker_service.process_batch(texts[start:start + batch_size]))
+    return results, time.perf_counter() - started
+
+def _write_part(path: Path, items: List[ReplayItem], results: List[Dict[str, Any]]) -> None:
+    pa, pq = _require_pyarrow()
+    entities = [result["entities"]["entities"] for result in results]
+    table = pa.table({
+        "message_id": pa.array([item.message_id for item in items], pa.int64()),
+        "conversation_id": pa.array([item.conversation_id for item in items], pa.int64()),
+        "timestamp": pa.array([item.timestamp for item in items], pa.timestamp("us")),
+        "text": pa.array([item.text for item in items], pa.string()),
+        "intent": pa.array([result["intent"]["intent"] for result in results], pa.string()),
+        "confidence": pa.array([result["intent"]["confidence"] for result in results], pa.float32()),
+        "entity_labels": pa.array([[e["entity"] for e in found] for found in entities], pa.list_(pa.string())),
+        "entity_values": pa.array([[e["word"] for e in found] for found in entities], pa.list_(pa.string())),
+        "entity_sources": pa.array([[e.get("source") for e in found] for found in entities], pa.list_(pa.string())),
+        "reply_id": pa.array([item.reply_id for item in items], pa.int64()),
+        "rating": pa.array([item.rating for item in items], pa.float32()),
+        "rating_count": pa.array([item.rating_count for item in items], pa.int32())
+    })
+    # Write then rename so a crash never leaves a half-written part behind
+    partial = path.with_suffix(".tmp")
+    pq.write_table(table, partial)
+    os.replace(partial, path)
+
+def _read_columns(directory: Path, columns: List[str]) -> Dict[str, list]:
+    _, pq = _require_pyarrow()
+    merged: Dict[str, list] = {column: [] for column in columns}
+    for part in sorted(directory.glob("part-*.parquet")):
+        table = pq.read_table(part, columns=columns)
+        for column in columns:
+            merged[column].extend(table.column(column).to_pylist())
+    return merged
+
+def build_report(output: Path, baseline: Optional[Path]) -> Dict[str, Any]:
+    """Summarize the replay, reading only the columns each figure needs."""
+    data = _read_columns(output, ["message_id", "intent", "confidence", "entity_labels", "rating"])
+    total = len(data["message_id"])
+    intents = Counter(data["intent"])
+    ratings: Dict[str, List[float]] = defaultdict(list)
+    for intent, rating in zip(data["intent"], data["rating"]):
+        if rating is not None:
+            ratings[intent].append(rating)
+
+    report: Dict[str, Any] = {
+        "messages": total,
+        "intents": dict(intents.most_common()),
+        "unknown_rate": intents.get("unknown", 0) / total if total else None,
+        "with_entities_rate": sum(1 for labels in data["entity_labels"] if labels) / total if total else None,
+        "confidence": {
+            "p10": percentile(data["confidence"], 0.10),
+            "p50": percentile(data["confidence"], 0.50),
+            "p90": percentile(data["confidence"], 0.90)
+        },
+        "feedback": {
+            intent: {
+                "rated": len(values),
+                "mean_rating": sum(values) / len(values),
+                "low_rating_rate": sum(1 for value in values if value <= 2) / len(values)
+            }
+            for intent, values in sorted(ratings.items())
+        }
+    }
+
+    if baseline is not None:
+        previous = _read_columns(baseline, ["message_id", "intent"])
+        previous_intents = dict(zip(previous["message_id"], previous["intent"]))
+        compared = agreed = 0
+        changes: Counter = Counter()
+        for message_id, intent in zip(data["message_id"], data["intent"]):
+            old = previous_intents.get(message_id)
+            if old is None:
+                continue
+            compared += 1
+            if old == intent:
+                agreed += 1
+            else:
+                changes[f"{old} -> {intent}"] += 1
+        report["baseline"] = {
+            "path": str(baseline),
+            "compared": compared,
+            "agreement": agreed / compared if compared else None,
+            "top_changes": dict(changes.most_common(20))
+        }
+    return report
+
+def _run_fingerprint() -> Dict[str, Any]:
+    with open(DATA_DIR / "intents.json", "r") as f:
+        intents = json.load(f)
+    return {
+        "intents": intents_fingerprint(intents),
+        "encoder": INTENT_ENCODER_NAME,
+        "ner": NER_MODEL_NAME,
+        "backend": NLP_BACKEND
+    }
+
+def _load_checkpoint(output: Path, fingerprint: Dict[str, Any], restart: bool) -> Dict[str, Any]:
+    path = output / CHECKPOINT_FILE
+    if restart or not path.exists():
+        for stale in output.glob("part-*.parquet"):
+            stale.unlink()
+        return {"cursor": None, "parts": 0, "messages": 0, "fingerprint": fingerprint}
+
+    checkpoint = json.loads(path.read_text())
+    if checkpoint.get("fingerprint") != fingerprint:
+        raise SystemExit(
+            f"{output} was replayed with different intents or models; pass --restart to start over"
+        )
+    return checkpoint
+
+def _save_checkpoint(output: Path, checkpoint: Dict[str, Any]) -> None:
+    path = output / CHECKPOINT_FILE
+    partial = path.with_suffix(".tmp")
+    partial.write_text(json.dumps(checkpoint))
+    os.replace(partial, path)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay stored messages through the NLP models")
+    parser.add_argument("output", type=Path, help="directory for Parquet parts, checkpoint and report")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="inference threads per worker (default: cpu count / workers)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="messages read and dispatched at a time")
+    parser.add_argument("--batch-size", type=int, default=64, help="messages per model forward pass")
+    parser.add_argument("--baseline", type=Path, help="earlier replay output to measure agreement against")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    try:
+        _require_pyarrow()
+    except RuntimeError as exc:
+        raise SystemExit(str(exc))
+    args.output.mkdir(parents=True, exist_ok=True)
+    checkpoint = _load_checkpoint(args.output, _run_fingerprint(), args.restart)
+
+    with SessionLocal() as db:
+        knowledge_terms = KnowledgeSnapshot.load(db, read_version(db)).gazetteer_terms()
+
+    # Workers are spawned, so they read these when they import the config
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    os.environ["NLP_INTRA_OP_THREADS"] = str(threads)
+    os.environ["NLP_INTER_OP_THREADS"] = "1"
+    os.environ["NLP_CACHE_ENABLED"] = "false"
+    os.environ["NLP_BATCHING_ENABLED"] = "false"
+
+    started = time.perf_counter()
+    replayed = 0
+    in_flight: deque = deque()
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(knowledge_terms,)
+    ) as pool:
+
+        def drain(limit: int) -> None:
+            # Parts are written in submission order so the checkpoint only moves forward
+            nonlocal replayed
+            while len(in_flight) > limit:
+                items, future = in_flight.popleft()
+                results, seconds = future.result()
+                _write_part(args.output / PART_PATTERN.format(checkpoint["parts"]), items, results)
+                checkpoint["parts"] += 1
+                checkpoint["messages"] += len(items)
+                checkpoint["cursor"] = _cursor_key(items[-1])
+                _save_checkpoint(args.output, checkpoint)
+                replayed += len(items)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    "Replayed %d messages (%.0f/s); last chunk took %.2fs in its worker",
+                    checkpoint["messages"], replayed / elapsed if elapsed else 0.0, seconds
+                )
+
+        for items in iter_chunks(args.chunk_size, checkpoint["cursor"]):
+            texts = [item.text for item in items]
+            in_flight.append((items, pool.submit(_replay_chunk, texts, args.batch_size)))
+            drain(args.workers * 2)
+        drain(0)
+
+    report = build_report(args.output, args.baseline)
+    report["seconds"] = time.perf_counter() - started
+    report["replayed_this_run"] = replayed
+    (args.output / REPORT_FILE).write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Replayed {checkpoint['messages']} messages into {args.output}; report in {args.output / REPORT_FILE}")
+
+if __name__ == "__main__":
+    main()
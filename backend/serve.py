@@ -0,0 +1,187 @@
+"""Prefork launcher: load the NLP models once, then fork workers that share them.
+
+Usage: python -m backend.serve [--workers N] [--threads-per-worker N] [--host H] [--port P]
+
+The parent imports the app and loads the models, then binds the listening
+socket and forks the workers. Model weights are read-only after loading,
+so copy-on-write keeps one physical copy shared by every worker. Each
+worker runs its own event loop, database pools and warm-up.
+
+The parent loads the models single-threaded, so no OpenMP or ONNX Runtime
+thread pool exists at fork time. Each worker then pins its own torch
+intra-op pool, which keeps workers from oversubscribing the cores. ONNX
+Runtime sessions keep the single thread they were created with.
+
+Every worker reports its own USS (unique set size) under "memory" in
+/health. The parent also logs a per-worker table every
+SERVER_MEMORY_REPORT_SECONDS.
+
+Session tables, NLP caches and Prometheus metrics are per worker. Without
+sticky routing, a user's turns may reach different workers, and a worker's
+cached session can miss turns another worker handled. So the launcher
+runs one worker unless --workers is given; only raise it behind a load
+balancer that routes each user to the same worker. Persistence is shared
+through the database.
+"""
+from typing import Dict
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("backend.serve")
+
+def preload_models() -> None:
+    """Build the shared NLP service and every model it uses, without running inference."""
+    from .core.config import NER_FALLBACK_ENABLED
+    from .services.model_registry import model_registry
+
+    started = time.perf_counter()
+    nlp_service = model_registry.get_nlp_service()
+    if NER_FALLBACK_ENABLED:
+        nlp_service.ner_model
+    logger.info("Preloaded models in %.2fs", time.perf_counter() - started)
+
+def available_cpus() -> int:
+    """Cores this process may run on, which respects a container's cpuset."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on macOS
+        return os.cpu_count() or 1
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket, threads: int, log_level: str) -> None:
+    """Serve the app on the inherited socket until told to stop (runs in the child)."""
+    import uvicorn
+    from .services.inference_backends import pin_worker_threads
+
+    pin_worker_threads(threads)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+def log_memory(workers: Dict[int, int]) -> None:
+    from .core.memory import process_memory
+
+    parent = process_memory()
+    if parent is None:
+        return
+    lines = [f"parent pid {parent['pid']}: rss {parent['rss_bytes'] >> 20} MiB, uss {parent['uss_bytes'] >> 20} MiB"]
+    for pid, slot in sorted(workers.items(), key=lambda item: item[1]):
+        memory = process_memory(pid)
+        if memory is not None:
+            lines.append(
+                f"worker {slot} pid {pid}: rss {memory['rss_bytes'] >> 20} MiB, "
+                f"pss {memory['pss_bytes'] >> 20} MiB, uss {memory['uss_bytes'] >> 20} MiB"
+            )
+    logger.info("Memory per process\n%s", "\n".join(lines))
+
+def main() -> None:
+    # Load in the parent with single-threaded pools; workers re-pin after the fork
+    os.environ["NLP_INTRA_OP_THREADS"] = "1"
+    os.environ["NLP_INTER_OP_THREADS"] = "1"
+    from .core.config import (
+        SERVER_HOST,
+        SERVER_MEMORY_REPORT_SECONDS,
+        SERVER_PORT,
+        SERVER_THREADS_PER_WORKER,
+        SERVER_WORKERS
+    )
+
+    parser = argparse.ArgumentParser(description="Run the API with preforked workers sharing one copy of the models")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--threads-per-worker", type=int, default=SERVER_THREADS_PER_WORKER,
+                        help="torch intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--memory-report-seconds", type=float, default=SERVER_MEMORY_REPORT_SECONDS,
+                        help="interval of the per-worker memory log (0 disables it)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(name)s %(message)s")
+
+    workers = max(1, args.workers)
+    threads = args.threads_per_worker or max(1, available_cpus() // workers)
+
+    # Import the app and load the models before forking so every worker shares them
+    import uvicorn  # noqa: F401 -- fail here, not in a restart loop of workers
+    from .main import app
+    preload_models()
+    sock = bind_socket(args.host, args.port)
+    # Keep the garbage collector from touching (and so copying) the preloaded objects
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(app, sock, threads, args.log_level)
+            except BaseException:
+                logger.exception("Worker %d crashed", slot)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(workers):
+        spawn(slot)
+    logger.info(
+        "Serving on %s:%d with %d workers, %d inference threads each",
+        args.host, args.port, workers, threads
+    )
+
+    next_report = time.monotonic() + min(30.0, args.memory_report_seconds)
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if args.memory_report_seconds > 0 and not stopping and time.monotonic() >= next_report:
+                log_memory(children)
+                next_report = time.monotonic() + args.memory_report_seconds
+            time.sleep(0.5)
+            continue
+
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            logger.warning("Worker %d (pid %d) exited with status %d; restarting it", slot, pid, status)
+            time.sleep(1.0)
+            spawn(slot)
+
+    sock.close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+from ..core.config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_MS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_MAX_USERS
+)
+from ..core.stats import percentile
+
+class Overloaded(Exception):
+    """Raised when a request is shed; ``retry_after`` is in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounds how many chat turns run at once and how many may wait for a slot.
+
+    At most ``max_in_flight`` turns run concurrently. Up to ``max_queue``
+    more wait in FIFO order, each for at most ``queue_timeout_ms``.
+    Anything beyond that is rejected immediately, so admitted requests keep
+    a bounded latency instead of every request timing out together.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout_ms: float, stats_window: int = 1024):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._service_seconds = 0.0
+        self._queue_waits_ms: deque = deque(maxlen=stats_window)
+
+    def _retry_after(self) -> int:
+        # Time for the current backlog to drain at the recent per-turn service time
+        backlog = self.queued + self.in_flight
+        return max(1, math.ceil(backlog * self._service_seconds / self.max_in_flight))
+
+    async def acquire(self) -> float:
+        """Wait for a slot, or raise Overloaded; pass the returned token to ``release``."""
+        # Created lazily so the semaphore binds to the serving event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.shed_queue_full += 1
+            raise Overloaded("queue_full", self._retry_after())
+
+        enqueued = time.perf_counter()
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            raise Overloaded("queue_timeout", self._retry_after())
+        finally:
+            self.queued -= 1
+
+        started = time.perf_counter()
+        self._queue_waits_ms.append((started - enqueued) * 1000)
+        self.admitted += 1
+        self.in_flight += 1
+        return started
+
+    def release(self, started: float) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+        # Exponentially weighted service time, used for Retry-After hints
+        elapsed = time.perf_counter() - started
+        self._service_seconds = elapsed if not self._service_seconds else 0.9 * self._service_seconds + 0.1 * elapsed
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a slot for the duration of the block, or raise Overloaded."""
+        started = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def reset(self) -> None:
+        """Drop loop-bound state so the controller can be reused on a new event loop."""
+        self._slots = None
+        self.in_flight = 0
+        self.queued = 0
+
+    def stats(self) -> Dict[str, Any]:
+        waits = list(self._queue_waits_ms)
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "queue_wait_ms": {
+                "p50": percentile(waits, 0.50),
+                "p99": percentile(waits, 0.99),
+                "max": max(waits) if waits else None
+            }
+        }
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilled at ``rate_per_minute``, holding at most ``burst`` tokens.
+
+    Buckets live in an LRU map bounded by ``max_keys``. Evicting an idle key
+    only forgets a bucket that would have refilled to full anyway.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 100000, enabled: bool = True):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        self.enabled = enabled and rate_per_minute > 0
+        self._buckets: "OrderedDict[Any, list]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: Any) -> Optional[float]:
+        """Take one token for ``key``; returns None if allowed, else seconds until one is available."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            self.allowed += 1
+            return None
+        self.limited += 1
+        return (1.0 - bucket[0]) / self.rate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rate_per_minute": self.rate * 60.0,
+            "burst": self.burst,
+            "tracked_users": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited
+        }
+
+admission_controller = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_MS)
+user_rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, RATE_LIMIT_MAX_USERS, RATE_LIMIT_ENABLED)
+
+def admission_stats() -> Dict[str, Any]:
+    return {**admission_controller.stats(), "rate_limit": user_rate_limiter.stats()}
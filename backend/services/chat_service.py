@@ -1,72 +1,169 @@
-from typing import Dict, Any, List
-from ..models.knowledge import Department, Program, Faculty, Building, Event, Service
-from ..models.user import Conversation, Message
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from ..models.user import Conversation
+from .conversation_context import ConversationContext
 from .nlp_service import NLPService
-from sqlalchemy.orm import Session
-import json
+from .model_registry import get_nlp_service
+from .knowledge_snapshot import KnowledgeSnapshot, knowledge_store
+from ..core.config import (
+    CONVERSATION_INACTIVITY_MINUTES,
+    EVENTS_LOOKAHEAD_DAYS,
+    EVENTS_MAX_RESULTS,
+    KNOWLEDGE_SEARCH_RESULTS
+)
+from ..core.metrics import StageTimer
+from .inference_executor import run_inference
+from .message_writer import PendingTurn, message_writer
+from .session_table import ActiveSession, session_table
+from .gazetteer import normalize
+from .time_expressions import campus_now, parse_time_expression, period_window
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from functools import partial
+import time
+
+# Knowledge searched for an intent whose entities were missing or unknown
+SEARCH_KINDS = {
+    "academic_info": ("departments", "programs"),
+    "campus_location": ("buildings",),
+    "events": ("events",),
+    "student_services": ("services",)
+}
 
 class ChatService:
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: AsyncSession,
+        nlp_service: Optional[NLPService] = None,
+        knowledge: Optional[KnowledgeSnapshot] = None
+    ):
         self.db = db
-        self.nlp_service = NLPService()
+        # Reuse the process-wide NLP service so models are never reloaded per request
+        self.nlp_service = nlp_service or get_nlp_service()
+        # Pin one knowledge snapshot for the whole request; responses never query the catalog
+        self.knowledge = knowledge or knowledge_store.snapshot
         
-    def process_message(self, user_id: int, message_text: str) -> Dict[str, Any]:
+    async def process_message(self, user_id: int, message_text: str) -> Dict[str, Any]:
         """Process a user message and generate a response."""
-        # Get or create conversation
-        conversation = self._get_or_create_conversation(user_id)
+        result: Dict[str, Any] = {}
+        async for event in self.stream_message(user_id, message_text):
+            if event["event"] == "message":
+                result = event
+        return {key: value for key, value in result.items() if key != "event"}
+    
+    async def stream_message(self, user_id: int, message_text: str) -> AsyncIterator[Dict[str, Any]]:
+        """Process a user message, yielding events as each stage completes.
+        
+        A ``typing`` event carrying the classified intent is yielded as soon
+        as NLP finishes, before response generation and persistence, so a
+        streaming client can react while the reply is still being built. The
+        final ``message`` event has the same fields ``process_message`` returns.
+        """
+        timer = StageTimer()
+        
+        # Get or create conversation; active sessions are served from memory
+        with timer.stage("conversation_lookup"):
+            session = await self._get_or_create_session(user_id)
         
-        # Process the message with NLP
-        nlp_result = self.nlp_service.process_message(message_text)
+        # Process the message with NLP on the inference pool, off the event loop
+        with timer.stage("nlp"):
+            nlp_result = await run_inference(self.nlp_service.process_message, message_text, timer)
+        
+        yield {
+            "event": "typing",
+            "conversation_id": session.conversation_id,
+            "intent": nlp_result["intent"]["intent"],
+            "confidence": nlp_result["intent"]["confidence"]
+        }
         
         # Update conversation context
-        current_context = json.loads(conversation.context) if conversation.context else {}
-        updated_context = self.nlp_service.update_context(current_context, nlp_result)
-        conversation.context = json.dumps(updated_context)
-        
-        # Save user message
-        user_message = Message(
-            conversation_id=conversation.id,
-            content=message_text,
-            is_user=True
-        )
-        self.db.add(user_message)
+        with timer.stage("context_update"):
+            updated_context = self.nlp_service.update_context(session.context, nlp_result)
+            session.last_activity = datetime.utcnow()
+            session_table.put(user_id, session)
         
         # Generate response
-        response = self._generate_response(nlp_result, updated_context)
+        with timer.stage("response_generation"):
+            response = self._generate_response(nlp_result, updated_context)
         
-        # Save bot response
-        bot_message = Message(
-            conversation_id=conversation.id,
-            content=response["text"],
-            is_user=False
-        )
-        self.db.add(bot_message)
+        # Queue both messages and the new context for write-behind persistence
+        with timer.stage("persistence"):
+            user_message_id, bot_message_id = await self._persist_turn(
+                session.conversation_id, message_text, response, updated_context
+            )
+        timer.observe(nlp_result["intent"]["intent"])
         
-        self.db.commit()
-        
-        return {
+        yield {
+            "event": "message",
             "response": response,
-            "conversation_id": conversation.id
+            "conversation_id": session.conversation_id,
+            "user_message_id": user_message_id,
+            "bot_message_id": bot_message_id
         }
     
-    def _get_or_create_conversation(self, user_id: int) -> Conversation:
-        """Get the most recent active conversation or create a new one."""
-        conversation = self.db.query(Conversation)\
-            .filter(Conversation.user_id == user_id)\
-            .order_by(Conversation.last_activity.desc())\
-            .first()
+    async def _persist_turn(
+        self,
+        conversation_id: int,
+        message_text: str,
+        response: Dict[str, Any],
+        context: ConversationContext
+    ) -> Tuple[int, int]:
+        """Hand a turn to the write-behind queue and return its (user, bot) message ids.
+        
+        The ids are reserved up front so the client can reference the
+        messages before their rows are written.
+        """
+        user_message_id, bot_message_id = await message_writer.allocate_message_ids(self.db, 2)
+        await message_writer.submit(PendingTurn(
+            conversation_id=conversation_id,
+            user_message_id=user_message_id,
+            bot_message_id=bot_message_id,
+            user_text=message_text,
+            bot_text=response["text"],
+            context=context.encode(),
+            timestamp=datetime.utcnow(),
+            enqueued_at=time.monotonic()
+        ))
+        return user_message_id, bot_message_id
+    
+    async def _get_or_create_session(self, user_id: int) -> ActiveSession:
+        """Return the user's active conversation, starting a new one after a long gap.
+        
+        The session table answers most turns without a query; on a miss the
+        most recent conversation is loaded once and cached.
+        """
+        inactivity_gap = timedelta(minutes=CONVERSATION_INACTIVITY_MINUTES)
+        now = datetime.utcnow()
+        
+        session = session_table.get(user_id)
+        if session is not None and now - session.last_activity < inactivity_gap:
+            return session
+        
+        conversation = await self.db.scalar(
+            select(Conversation)
+            .filter(Conversation.user_id == user_id)
+            .order_by(Conversation.last_activity.desc())
+            .limit(1)
+        )
+        
+        if conversation:
+            last_activity = conversation.last_activity or conversation.started_at or now
+            if now - last_activity < inactivity_gap:
+                # Prefer a newer context that is still waiting to be written
+                stored_context = message_writer.pending_context(conversation.id) or conversation.context
+                return ActiveSession(conversation.id, self.nlp_service.new_context(stored_context), last_activity)
             
-        if not conversation:
-            conversation = Conversation(user_id=user_id)
-            self.db.add(conversation)
-            self.db.commit()
+        conversation = Conversation(user_id=user_id, started_at=now, last_activity=now)
+        self.db.add(conversation)
+        await self.db.commit()
             
-        return conversation
+        return ActiveSession(conversation.id, self.nlp_service.new_context(), now)
     
-    def _generate_response(self, nlp_result: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_response(self, nlp_result: Dict[str, Any], context: ConversationContext) -> Dict[str, Any]:
         """Generate a response based on the NLP results and context."""
         intent = nlp_result["intent"]["intent"]
         entities = nlp_result["entities"]["entities"]
+        text = nlp_result["original_text"]
         
         # Map intent to appropriate response generator
         response_generators = {
@@ -75,28 +172,31 @@ class ChatService:
             "financial_aid": self._generate_financial_aid_response,
             "campus_location": self._generate_location_response,
             "faculty_info": self._generate_faculty_response,
-            "events": self._generate_events_response,
+            "events": partial(self._generate_events_response, text=text),
             "student_services": self._generate_services_response,
             "housing": self._generate_housing_response
         }
         
-        generator = response_generators.get(intent, self._generate_fallback_response)
-        return generator(entities, context)
+        generator = response_generators.get(intent)
+        if generator is None:
+            return self._generate_fallback_response(entities, context, text)
+        
+        response = generator(entities, context)
+        if response["type"] == "clarification" and intent in SEARCH_KINDS:
+            # Offer the closest records before asking the student to rephrase
+            return self._search_response(text, SEARCH_KINDS[intent]) or response
+        return response
     
-    def _generate_academic_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_academic_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for academic information queries."""
         # Extract relevant entities
         departments = [e["word"] for e in entities if e["entity"] == "departments"]
         
         if departments:
-            department = self.db.query(Department)\
-                .filter(Department.name.in_(departments))\
-                .first()
+            department = self.knowledge.find_department(departments)
                 
             if department:
-                programs = self.db.query(Program)\
-                    .filter(Program.department_id == department.id)\
-                    .all()
+                programs = self.knowledge.programs_for(department.id)
                     
                 program_list = "\n".join([f"- {p.name} ({p.degree_type})" for p in programs])
                 
@@ -110,7 +210,7 @@ class ChatService:
             "type": "clarification"
         }
     
-    def _generate_registration_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_registration_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for registration-related queries."""
         time_periods = [e["word"] for e in entities if e["entity"] == "time_periods"]
         
@@ -125,21 +225,19 @@ class ChatService:
             "type": "clarification"
         }
     
-    def _generate_financial_aid_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_financial_aid_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for financial aid queries."""
         return {
             "text": "The Financial Aid office is located in the Student Services Building. You can apply for financial aid by completing the FAFSA form. The priority deadline is typically March 1st for the following academic year. Would you like more specific information about scholarships or other financial aid options?",
             "type": "financial_aid_info"
         }
     
-    def _generate_location_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_location_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for location queries."""
         buildings = [e["word"] for e in entities if e["entity"] == "buildings"]
         
         if buildings:
-            building = self.db.query(Building)\
-                .filter(Building.name.in_(buildings))\
-                .first()
+            building = self.knowledge.find_building(buildings)
                 
             if building:
                 return {
@@ -152,17 +250,13 @@ class ChatService:
             "type": "clarification"
         }
     
-    def _generate_faculty_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_faculty_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for faculty information queries."""
         faculty_roles = [e["word"] for e in entities if e["entity"] == "faculty_roles"]
         departments = [e["word"] for e in entities if e["entity"] == "departments"]
         
         if departments and faculty_roles:
-            faculty = self.db.query(Faculty)\
-                .join(Department)\
-                .filter(Department.name.in_(departments))\
-                .filter(Faculty.title.in_(faculty_roles))\
-                .first()
+            faculty = self.knowledge.find_faculty(departments, faculty_roles)
                 
             if faculty:
                 return {
@@ -175,14 +269,22 @@ class ChatService:
             "type": "clarification"
         }
     
-    def _generate_events_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_events_response(
+        self,
+        entities: List[Dict[str, Any]],
+        context: ConversationContext,
+        text: str = ""
+    ) -> Dict[str, Any]:
         """Generate response for events queries."""
         events = [e["word"] for e in entities if e["entity"] == "events"]
         
+        # "What's on this weekend?", "career events during finals week"
+        listing = self._list_events(entities, text, events)
+        if listing is not None:
+            return listing
+        
         if events:
-            event = self.db.query(Event)\
-                .filter(Event.title.in_(events))\
-                .first()
+            event = self.knowledge.find_event(events)
                 
             if event:
                 return {
@@ -195,14 +297,54 @@ class ChatService:
             "type": "clarification"
         }
     
-    def _generate_services_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _list_events(self, entities: List[Dict[str, Any]], text: str, titles: List[str]) -> Optional[Dict[str, Any]]:
+        """List the events in the time window and/or category the message names, if it names one."""
+        now = campus_now()
+        timeline = self.knowledge.events_timeline
+        window = parse_time_expression(text, now, EVENTS_LOOKAHEAD_DAYS)
+        if window is None:
+            periods = (period_window(e["word"], now) for e in entities if e["entity"] == "time_periods")
+            window = next((found for found in periods if found is not None), None)
+        category = timeline.match_category(text)
+        if window is None and (category is None or titles):
+            # Without a time, a named event is looked up by title instead
+            return None
+        
+        if category is not None:
+            timeline = timeline.by_category[category]
+        if window is None:
+            found = timeline.upcoming(now, EVENTS_MAX_RESULTS)
+            when = "coming up"
+        else:
+            found = timeline.between(window.start, window.end, EVENTS_MAX_RESULTS if not titles else None)
+            when = window.label
+        if titles:
+            # Event types such as "Workshop" narrow the list to matching titles
+            wanted = [normalize(title) for title in titles]
+            found = [e for e in found if any(w in normalize(e.title or "") for w in wanted)]
+        found = found[:EVENTS_MAX_RESULTS]
+        
+        kind = f"{titles[0] if titles else category or ''} events".strip()
+        if not found:
+            return {
+                "text": f"I couldn't find any {kind.lower()} {when}. Would you like to hear about other upcoming events?",
+                "type": "event_list"
+            }
+        lines = [
+            f"- {e.title}: {e.start_time:%a %b %d, %I:%M %p}" + (f" at {e.location}" if e.location else "")
+            for e in found
+        ]
+        return {
+            "text": f"Here are the {kind.lower()} {when}:\n" + "\n".join(lines),
+            "type": "event_list"
+        }
+    
+    def _generate_services_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for student services queries."""
         services = [e["word"] for e in entities if e["entity"] == "services"]
         
         if services:
-            service = self.db.query(Service)\
-                .filter(Service.name.in_(services))\
-                .first()
+            service = self.knowledge.find_service(services)
                 
             if service:
                 return {
@@ -215,15 +357,39 @@ class ChatService:
             "type": "clarification"
         }
     
-    def _generate_housing_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_housing_response(self, entities: List[Dict[str, Any]], context: ConversationContext) -> Dict[str, Any]:
         """Generate response for housing queries."""
         return {
             "text": "On-campus housing applications typically open in October for the following academic year. There are several residence hall options available, including traditional dorms and apartment-style living. Would you like more specific information about housing options or the application process?",
             "type": "housing_info"
         }
     
-    def _generate_fallback_response(self, entities: List[Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _search_response(self, text: str, kinds: Optional[Tuple[str, ...]] = None) -> Optional[Dict[str, Any]]:
+        """List the knowledge records best matching the message, or None if nothing matches."""
+        hits = self.knowledge.search(text, KNOWLEDGE_SEARCH_RESULTS, kinds)
+        if not hits:
+            return None
+        
+        lines = []
+        for kind, record, _ in hits:
+            name = record.title if kind == "events" else record.name
+            details = [detail for detail in (record.description, getattr(record, "location", None)) if detail]
+            lines.append(f"- {name}: {' '.join(details)}" if details else f"- {name}")
+        return {
+            "text": "Here is what I found that might help:\n" + "\n".join(lines),
+            "type": "search_results"
+        }
+    
+    def _generate_fallback_response(
+        self,
+        entities: List[Dict[str, Any]],
+        context: ConversationContext,
+        text: str = ""
+    ) -> Dict[str, Any]:
         """Generate a fallback response when the intent is not recognized."""
+        found = self._search_response(text) if text else None
+        if found is not None:
+            return found
         return {
             "text": "I'm not sure I understand your question. Could you please rephrase it or provide more details? I can help you with information about academics, registration, campus locations, events, and more.",
             "type": "fallback"
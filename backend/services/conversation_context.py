@@ -0,0 +1,189 @@
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import base64
+import binascii
+import json
+import struct
+import zlib
+from .gazetteer import normalize
+
+# Serialized contexts start with this tag; anything starting with "{" is the legacy JSON blob
+CONTEXT_PREFIX = "ctx1:"
+CONTEXT_VERSION = 1
+
+# Turns kept per conversation and entities kept per turn
+MAX_TURNS = 5
+MAX_ENTITIES = 4
+
+_HEADER = struct.Struct("<BBB")          # version, ring head (slot of the oldest turn), turn count
+_TURN = struct.Struct("<IHB")            # intent id, quantized confidence, entity count
+_ENTITY = struct.Struct("<HI")           # label id, value id
+_RECORD_SIZE = _TURN.size + MAX_ENTITIES * _ENTITY.size
+_PAYLOAD_SIZE = _HEADER.size + MAX_TURNS * _RECORD_SIZE
+
+def intent_id(name: str) -> int:
+    return zlib.crc32(name.encode("utf-8"))
+
+def label_id(label: str) -> int:
+    return zlib.crc32(label.encode("utf-8")) & 0xFFFF
+
+def value_id(value: str) -> int:
+    return zlib.crc32(normalize(value).encode("utf-8"))
+
+class ContextVocabulary:
+    """Maps the hashed ids stored in a context back to intent, label and value names.
+
+    Ids are hashes rather than positions, so adding intents or knowledge
+    rows never changes the meaning of contexts that are already stored;
+    ids with no current name simply decode to None.
+    """
+
+    def __init__(self, intents: Iterable[str], labels: Iterable[str], values: Iterable[str]):
+        self.intents = {intent_id(name): name for name in intents}
+        self.labels = {label_id(label): label for label in labels}
+        self.values = {value_id(value): value for value in values}
+
+class ConversationContext:
+    """Fixed-size ring buffer of (intent, confidence, entity label/value) records.
+
+    ``MAX_TURNS`` slots are reused in rotation: once full, a new turn
+    overwrites the oldest slot and the head moves past it. Each turn is
+    stored as ids only, never the raw NER output or the text, so the
+    serialized form is always ``_PAYLOAD_SIZE`` bytes no matter what the
+    models emit, and it stores the slots and head as they are.
+    """
+
+    def __init__(self, vocabulary: ContextVocabulary):
+        self.vocabulary = vocabulary
+        self._slots: List[Optional[Tuple[int, int, Tuple[Tuple[int, int], ...]]]] = [None] * MAX_TURNS
+        self._head = 0
+        self._count = 0
+
+    @property
+    def _turns(self) -> List[Tuple[int, int, Tuple[Tuple[int, int], ...]]]:
+        """Held turns, oldest first."""
+        return [self._slots[(self._head + i) % MAX_TURNS] for i in range(self._count)]
+
+    def append(self, intent: str, confidence: float, entities: Iterable[Tuple[str, str]]) -> None:
+        """Record a turn, overwriting the oldest once ``MAX_TURNS`` are held."""
+        quantized = int(round(min(max(confidence, 0.0), 1.0) * 0xFFFF))
+        pairs = tuple(
+            (label_id(label), value_id(value)) for label, value in list(entities)[:MAX_ENTITIES]
+        )
+        self._slots[(self._head + self._count) % MAX_TURNS] = (intent_id(intent), quantized, pairs)
+        if self._count == MAX_TURNS:
+            self._head = (self._head + 1) % MAX_TURNS
+        else:
+            self._count += 1
+
+    def clear(self) -> None:
+        self._slots = [None] * MAX_TURNS
+        self._head = 0
+        self._count = 0
+
+    def turns(self) -> List[Dict[str, Any]]:
+        """Decoded turns, oldest first."""
+        return [
+            {
+                "intent": self.vocabulary.intents.get(intent),
+                "confidence": quantized / 0xFFFF,
+                "entities": [
+                    {"entity": self.vocabulary.labels.get(label), "word": self.vocabulary.values.get(value)}
+                    for label, value in pairs
+                ]
+            }
+            for intent, quantized, pairs in self._turns
+        ]
+
+    @property
+    def current_intent(self) -> Optional[str]:
+        if not self._count:
+            return None
+        return self.vocabulary.intents.get(self._slots[(self._head + self._count - 1) % MAX_TURNS][0])
+
+    def as_dict(self) -> Dict[str, Any]:
+        turns = self.turns()
+        return {
+            "intent_history": [{"intent": t["intent"], "confidence": t["confidence"]} for t in turns],
+            "entity_history": [t["entities"] for t in turns],
+            "current_intent": turns[-1]["intent"] if turns else None,
+            "current_entities": turns[-1]["entities"] if turns else None
+        }
+
+    def encode(self) -> str:
+        """Serialize into the versioned, constant-size text form stored on Conversation."""
+        payload = bytearray(_PAYLOAD_SIZE)
+        _HEADER.pack_into(payload, 0, CONTEXT_VERSION, self._head, self._count)
+        for slot, turn in enumerate(self._slots):
+            if turn is None:
+                continue
+            intent, quantized, pairs = turn
+            offset = _HEADER.size + slot * _RECORD_SIZE
+            _TURN.pack_into(payload, offset, intent, quantized, len(pairs))
+            offset += _TURN.size
+            for label, value in pairs:
+                _ENTITY.pack_into(payload, offset, label, value)
+                offset += _ENTITY.size
+        return CONTEXT_PREFIX + base64.b64encode(bytes(payload)).decode("ascii")
+
+    @classmethod
+    def decode(cls, stored: Optional[str], vocabulary: ContextVocabulary) -> "ConversationContext":
+        """Parse a stored context, migrating legacy JSON rows transparently."""
+        context = cls(vocabulary)
+        if not stored:
+            return context
+        if stored.startswith("{"):
+            context._load_legacy(stored)
+            return context
+        if not stored.startswith(CONTEXT_PREFIX):
+            return context
+
+        try:
+            payload = base64.b64decode(stored[len(CONTEXT_PREFIX):])
+            version, head, count = _HEADER.unpack_from(payload, 0)
+        except (binascii.Error, struct.error):
+            return context
+        if version != CONTEXT_VERSION or len(payload) != _PAYLOAD_SIZE or head >= MAX_TURNS:
+            return context
+
+        context._head, context._count = head, min(count, MAX_TURNS)
+        for i in range(context._count):
+            slot = (head + i) % MAX_TURNS
+            offset = _HEADER.size + slot * _RECORD_SIZE
+            intent, quantized, entity_count = _TURN.unpack_from(payload, offset)
+            offset += _TURN.size
+            pairs = tuple(
+                _ENTITY.unpack_from(payload, offset + j * _ENTITY.size)
+                for j in range(min(entity_count, MAX_ENTITIES))
+            )
+            context._slots[slot] = (intent, quantized, pairs)
+        return context
+
+    def _load_legacy(self, stored: str) -> None:
+        """Migrate a legacy JSON context; anything malformed leaves the context empty."""
+        try:
+            legacy = json.loads(stored)
+        except ValueError:
+            return
+        if not isinstance(legacy, dict):
+            return
+        intents = legacy.get("intent_history") or []
+        entity_results = legacy.get("entity_history") or []
+        if not isinstance(intents, list) or not isinstance(entity_results, list):
+            return
+        try:
+            for intent, entity_result in zip(intents, entity_results):
+                if not isinstance(intent, dict):
+                    continue
+                entities = entity_result.get("entities") if isinstance(entity_result, dict) else None
+                self.append(
+                    str(intent.get("intent")),
+                    float(intent.get("confidence") or 0.0),
+                    [
+                        (str(e.get("entity", "")), str(e.get("word", "")))
+                        for e in (entities if isinstance(entities, list) else [])
+                        if isinstance(e, dict)
+                    ]
+                )
+        except (TypeError, ValueError):
+            # E.g. a non-numeric or NaN confidence
+            self.clear()
@@ -0,0 +1,50 @@
+from typing import List
+from pathlib import Path
+import numpy as np
+from .inference_backends import FEATURE_EXTRACTION, load_model
+
+class SentenceEncoder:
+    """Mean-pooled, L2-normalized sentence embeddings from a transformer encoder."""
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        artifact_root: Path = Path("."),
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        max_length: int = 64
+    ):
+        import torch
+
+        self._torch = torch
+        self.model_name = model_name
+        self.backend = backend
+        self.max_length = max_length
+        self.tokenizer, self.model = load_model(
+            FEATURE_EXTRACTION,
+            model_name,
+            backend,
+            artifact_root,
+            intra_op_threads,
+            inter_op_threads
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a (len(texts), dim) float32 matrix of unit vectors."""
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt"
+        )
+        with self._torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+
+        # Mean-pool over real tokens only, ignoring padding
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        vectors = pooled.cpu().numpy().astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
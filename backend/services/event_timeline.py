@@ -0,0 +1,90 @@
+from typing import Dict, Any, Iterable, List, Optional
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from .gazetteer import normalize, tokenize
+
+class EventTimeline:
+    """Dated events sorted by start time, for range queries by bisection.
+
+    ``between`` finds every event overlapping a window without a scan. The
+    start list is bisected from ``window start - longest duration``, the
+    earliest start an overlapping event can have, up to the window end.
+    Each category gets its own timeline. ``upcoming`` keeps a cursor that
+    only moves forward with the clock, so the rolling "from now" window
+    never searches past events again.
+    """
+
+    def __init__(self, events: Iterable[Any], index_categories: bool = True):
+        dated = sorted((e for e in events if e.start_time), key=lambda e: (e.start_time, e.id))
+        self.events = tuple(dated)
+        self._starts = [e.start_time for e in dated]
+        self._ends = [max(e.end_time or e.start_time, e.start_time) for e in dated]
+        self._max_duration = max((end - start for start, end in zip(self._starts, self._ends)), default=timedelta(0))
+        self._cursor = 0
+        self._cursor_time: Optional[datetime] = None
+
+        self.by_category: Dict[str, "EventTimeline"] = {}
+        if index_categories:
+            grouped: Dict[str, List[Any]] = {}
+            for event in dated:
+                if event.category:
+                    grouped.setdefault(normalize(event.category), []).append(event)
+            self.by_category = {
+                category: EventTimeline(items, index_categories=False)
+                for category, items in grouped.items()
+            }
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def _roll_forward(self, now: datetime) -> int:
+        # Events starting before this bound have ended by ``now``
+        if self._cursor_time is None or now >= self._cursor_time:
+            self._cursor = bisect_left(self._starts, now - self._max_duration, lo=self._cursor)
+            self._cursor_time = now
+            return self._cursor
+        # An earlier clock (e.g. another worker thread that read it first) must not skip events
+        return bisect_left(self._starts, now - self._max_duration, hi=self._cursor)
+
+    def between(self, start: datetime, end: datetime, limit: Optional[int] = None) -> List[Any]:
+        """Events overlapping [start, end), earliest first."""
+        if self._cursor_time is not None and start >= self._cursor_time:
+            lo = bisect_left(self._starts, start - self._max_duration, lo=self._cursor)
+        else:
+            lo = bisect_left(self._starts, start - self._max_duration)
+        hi = bisect_left(self._starts, end, lo=lo)
+
+        found = []
+        for position in range(lo, hi):
+            # Zero-length events count as happening at their start time
+            if self._ends[position] > start or self._starts[position] >= start:
+                found.append(self.events[position])
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def upcoming(self, now: datetime, limit: int) -> List[Any]:
+        """Events still running or yet to start, earliest first."""
+        found = []
+        for position in range(self._roll_forward(now), len(self.events)):
+            if self._ends[position] > now or self._starts[position] >= now:
+                found.append(self.events[position])
+                if len(found) >= limit:
+                    break
+        return found
+
+    def match_category(self, text: str) -> Optional[str]:
+        """The first event category named in the text, as a ``by_category`` key."""
+        tokens = {token for token, _, _ in tokenize(text)}
+        for name in self.by_category:
+            # Accept plurals, e.g. "sports" for a "sport" category
+            if all(token in tokens or f"{token}s" in tokens for token in name.split()):
+                return name
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": len(self.events),
+            "categories": len(self.by_category),
+            "max_duration_hours": self._max_duration.total_seconds() / 3600
+        }
@@ -0,0 +1,125 @@
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from collections import deque
+import re
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)?")
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Split text into normalized tokens with their character offsets.
+
+    Tokens are lowercased and apostrophes are dropped, so "Registrar's" and
+    "registrars" normalize to the same token and punctuation or repeated
+    whitespace never affects matching.
+    """
+    return [
+        (match.group().lower().replace("'", "").replace("’", ""), match.start(), match.end())
+        for match in _TOKEN_PATTERN.finditer(text)
+    ]
+
+def normalize(text: str) -> str:
+    """Return the case- and whitespace-normalized form of a phrase."""
+    return " ".join(token for token, _, _ in tokenize(text))
+
+def domain_terms(
+    entities: Dict[str, Any],
+    extra_terms: Optional[Dict[str, List[Tuple[str, str]]]] = None
+) -> Dict[str, List[Tuple[str, str]]]:
+    """(surface, canonical) phrases by label from entities.json data plus knowledge-base terms.
+
+    Aliases in entities.json ("comp sci" -> "Computer Science") map to their
+    canonical name.
+    """
+    terms: Dict[str, List[Tuple[str, str]]] = {}
+    for label, definition in entities.get("entities", {}).items():
+        terms.setdefault(label, []).extend(
+            (example, example) for example in definition.get("examples", [])
+        )
+        terms[label].extend(definition.get("aliases", {}).items())
+    for label, phrases in (extra_terms or {}).items():
+        terms.setdefault(label, []).extend(phrases)
+    return terms
+
+class Gazetteer:
+    """Token-level Aho-Corasick matcher over the university domain vocabulary.
+
+    Every phrase is compiled into one automaton, so a message is tagged in a
+    single left-to-right pass regardless of how many phrases are known.
+    """
+
+    def __init__(self, terms: Dict[str, Iterable[Tuple[str, str]]]):
+        # Automaton state: transitions, failure links and (label, canonical, length) outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[str, str, int]]] = [[]]
+        self.size = 0
+
+        for label, phrases in terms.items():
+            for surface, canonical in phrases:
+                self._add(label, surface, canonical)
+        self._build_failure_links()
+
+    def _add(self, label: str, surface: str, canonical: str) -> None:
+        tokens = [token for token, _, _ in tokenize(surface)]
+        if not tokens:
+            return
+
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][token] = next_state
+            state = next_state
+
+        output = (label, canonical, len(tokens))
+        if output not in self._outputs[state]:
+            self._outputs[state].append(output)
+            self.size += 1
+
+    def _build_failure_links(self) -> None:
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for token, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def match(self, text: str) -> List[Dict[str, Any]]:
+        """Tag domain entities in text, preferring the longest non-overlapping spans."""
+        tokens = tokenize(text)
+        candidates = []
+        state = 0
+        for position, (token, _, _) in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for label, canonical, length in self._outputs[state]:
+                candidates.append((position - length + 1, position, label, canonical))
+
+        # Leftmost-longest selection; the same span may carry several labels
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+        entities = []
+        covered_until = -1
+        selected_span = None
+        for start, end, label, canonical in candidates:
+            if (start, end) != selected_span:
+                if start <= covered_until:
+                    continue
+                selected_span = (start, end)
+                covered_until = end
+            entities.append({
+                "entity": label,
+                "word": canonical,
+                "score": 1.0,
+                "start": tokens[start][1],
+                "end": tokens[end][2],
+                "source": "gazetteer"
+            })
+        return entities
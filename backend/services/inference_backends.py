@@ -0,0 +1,154 @@
+from typing import Any, Optional, Tuple
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# eager torch, dynamically int8-quantized torch, and exported ONNX Runtime graphs
+SUPPORTED_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Model heads used by the NLP service
+FEATURE_EXTRACTION = "feature-extraction"
+TOKEN_CLASSIFICATION = "token-classification"
+
+QUANTIZED_ONNX_FILE = "model_quantized.onnx"
+
+_threads_configured = False
+
+def validate_backend(backend: str) -> str:
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(
+            f"Unknown NLP backend '{backend}'; expected one of {', '.join(SUPPORTED_BACKENDS)}"
+        )
+    return backend
+
+def artifact_dir(root: Path, model_name: str, backend: str) -> Path:
+    """Directory holding the exported artifacts of one model for one backend."""
+    return root / backend / model_name.replace("/", "--")
+
+def torch_source(root: Path, model_name: str) -> str:
+    """Pinned local copy of a model saved by export_models --pin, else the hub model id."""
+    pinned = artifact_dir(root, model_name, "torch")
+    return str(pinned) if (pinned / "config.json").exists() else model_name
+
+def configure_threads(intra_op_threads: int, inter_op_threads: int) -> None:
+    """Pin torch's intra/inter-op thread pools once per process (0 keeps the default)."""
+    global _threads_configured
+    if _threads_configured:
+        return
+
+    import torch
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Can only be set before the first parallel region runs
+            logger.warning("Inter-op thread count already fixed; ignoring NLP_INTER_OP_THREADS")
+    _threads_configured = True
+
+def pin_worker_threads(intra_op_threads: int) -> None:
+    """Re-pin torch's intra-op pool in a forked worker, overriding the parent's setting."""
+    global _threads_configured
+    import torch
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    _threads_configured = True
+
+def _session_options(intra_op_threads: int, inter_op_threads: int):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if intra_op_threads > 0:
+        options.intra_op_num_threads = intra_op_threads
+    if inter_op_threads > 0:
+        options.inter_op_num_threads = inter_op_threads
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+def _ort_model_class(task: str):
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForTokenClassification
+    except ImportError as exc:
+        raise RuntimeError(
+            "The onnx backends require optimum[onnxruntime]; install it or set NLP_BACKEND=torch"
+        ) from exc
+    return ORTModelForFeatureExtraction if task == FEATURE_EXTRACTION else ORTModelForTokenClassification
+
+def _torch_model_class(task: str):
+    from transformers import AutoModel, AutoModelForTokenClassification
+    return AutoModel if task == FEATURE_EXTRACTION else AutoModelForTokenClassification
+
+def load_model(
+    task: str,
+    model_name: str,
+    backend: str,
+    artifact_root: Path,
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0
+) -> Tuple[Any, Any]:
+    """Load (tokenizer, model) for a task on the requested inference backend."""
+    from transformers import AutoTokenizer
+
+    validate_backend(backend)
+
+    if backend.startswith("onnx"):
+        source = artifact_dir(artifact_root, model_name, backend)
+        if not source.exists():
+            raise RuntimeError(
+                f"No {backend} export for {model_name} at {source}; "
+                "run python -m backend.scripts.export_models first"
+            )
+        model = _ort_model_class(task).from_pretrained(
+            source,
+            file_name=QUANTIZED_ONNX_FILE if backend == "onnx-int8" else "model.onnx",
+            session_options=_session_options(intra_op_threads, inter_op_threads)
+        )
+        return AutoTokenizer.from_pretrained(source), model
+
+    configure_threads(intra_op_threads, inter_op_threads)
+    source = torch_source(artifact_root, model_name)
+    model = _torch_model_class(task).from_pretrained(source)
+    model.eval()
+    if backend == "torch-int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return AutoTokenizer.from_pretrained(source), model
+
+def pin_torch(task: str, model_name: str, artifact_root: Path) -> Path:
+    """Save the tokenizer and weights locally so startup never needs the hub."""
+    from transformers import AutoTokenizer
+
+    pinned = artifact_dir(artifact_root, model_name, "torch")
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(pinned)
+    _torch_model_class(task).from_pretrained(model_name).save_pretrained(pinned)
+    return pinned
+
+def export_onnx(task: str, model_name: str, artifact_root: Path, quantize: bool = True) -> Tuple[Path, Optional[Path]]:
+    """Export a model to ONNX (and optionally a dynamically int8-quantized copy)."""
+    from transformers import AutoTokenizer
+
+    source = torch_source(artifact_root, model_name)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    onnx_dir = artifact_dir(artifact_root, model_name, "onnx")
+    model = _ort_model_class(task).from_pretrained(source, export=True)
+    model.save_pretrained(onnx_dir)
+    tokenizer.save_pretrained(onnx_dir)
+
+    if not quantize:
+        return onnx_dir, None
+
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    int8_dir = artifact_dir(artifact_root, model_name, "onnx-int8")
+    quantizer = ORTQuantizer.from_pretrained(onnx_dir)
+    quantizer.quantize(
+        save_dir=int8_dir,
+        quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    )
+    tokenizer.save_pretrained(int8_dir)
+    return onnx_dir, int8_dir
@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+from ..core.config import NLP_EXECUTOR_WORKERS
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool that runs model inference off the event loop."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=NLP_EXECUTOR_WORKERS, thread_name_prefix="inference")
+    return _executor
+
+async def run_inference(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking inference call on the inference pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_inference_executor(), fn, *args)
+
+def shutdown_inference_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,131 @@
+from concurrent.futures import Future
+from collections import Counter, deque
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+from ..core.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+class BatchScheduler:
+    """Gathers concurrent inference calls into padded batches for one model.
+
+    Items submitted within ``max_wait_ms`` of the first queued item (or until
+    ``max_batch_size`` is reached) are passed to ``batch_fn`` together, and each
+    caller receives its own result through a future.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        stats_window: int = 1024
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[Any, Future, float]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._queue_waits_ms: deque = deque(maxlen=stats_window)
+        self._batch_latency_ms: deque = deque(maxlen=stats_window)
+        self._items = 0
+        self._errors = 0
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item for batched inference and return a future for its result."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Run a single item through the scheduler and block until it is done."""
+        return self.submit(item).result()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"batch-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[Any, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name} batch returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as exc:
+                logger.exception("Batched %s inference failed", self.name)
+                with self._stats_lock:
+                    self._errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                continue
+
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._items += len(batch)
+                self._batch_latency_ms.append((finished - dispatched) * 1000)
+                for _, _, enqueued in batch:
+                    self._queue_waits_ms.append((dispatched - enqueued) * 1000)
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch-size and queue-wait statistics for tuning the batching window."""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            waits = list(self._queue_waits_ms)
+            latencies = list(self._batch_latency_ms)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queued": self._queue.qsize(),
+                "batches": batches,
+                "items": self._items,
+                "errors": self._errors,
+                "mean_batch_size": self._items / batches if batches else None,
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "queue_wait_ms": {
+                    "p50": percentile(waits, 0.50),
+                    "p99": percentile(waits, 0.99),
+                    "max": max(waits) if waits else None
+                },
+                "batch_latency_ms": {
+                    "p50": percentile(latencies, 0.50),
+                    "p99": percentile(latencies, 0.99)
+                }
+            }
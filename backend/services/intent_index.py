@@ -0,0 +1,136 @@
+from typing import Dict, Any, List
+from pathlib import Path
+import hashlib
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_INTENT = "unknown"
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+def intents_fingerprint(intents: Dict[str, Any]) -> str:
+    """Stable hash of the intent definitions, used to detect a stale index."""
+    encoded = json.dumps(intents, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def encoder_identity(encoder) -> str:
+    """Model name plus inference backend; quantized backends embed differently from fp32."""
+    backend = getattr(encoder, "backend", None)
+    return f"{encoder.model_name}@{backend}" if backend else encoder.model_name
+
+class IntentIndex:
+    """Nearest-example intent classifier over a precomputed embedding matrix.
+
+    Each row of ``matrix`` is the unit-normalized embedding of one example
+    from intents.json. Rows are grouped by intent, so one matrix product plus
+    a segmented max gives the best-matching example score for every intent.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        intent_names: List[str],
+        row_offsets: List[int],
+        encoder_name: str,
+        fingerprint: str,
+        threshold: float
+    ):
+        self.matrix = matrix
+        self.intent_names = intent_names
+        self.row_offsets = np.asarray(row_offsets, dtype=np.intp)
+        self.encoder_name = encoder_name
+        self.fingerprint = fingerprint
+        self.threshold = threshold
+
+    @classmethod
+    def build(cls, intents: Dict[str, Any], encoder, threshold: float) -> "IntentIndex":
+        """Encode every intent example once into a grouped embedding matrix."""
+        intent_names: List[str] = []
+        row_offsets: List[int] = []
+        examples: List[str] = []
+        for name, definition in intents.get("intents", {}).items():
+            intent_examples = definition.get("examples", [])
+            if not intent_examples:
+                continue
+            intent_names.append(name)
+            row_offsets.append(len(examples))
+            examples.extend(intent_examples)
+
+        if not examples:
+            raise ValueError("intents.json does not contain any intent examples")
+
+        matrix = encoder.encode(examples)
+        return cls(
+            matrix,
+            intent_names,
+            row_offsets,
+            encoder_identity(encoder),
+            intents_fingerprint(intents),
+            threshold
+        )
+
+    def save(self, directory: Path) -> None:
+        """Persist the matrix and its metadata so later processes can memory-map it."""
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / EMBEDDINGS_FILE, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        with open(directory / METADATA_FILE, "w") as f:
+            json.dump({
+                "intent_names": self.intent_names,
+                "row_offsets": self.row_offsets.tolist(),
+                "encoder_name": self.encoder_name,
+                "fingerprint": self.fingerprint
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: Path, threshold: float) -> "IntentIndex":
+        """Load a persisted index, memory-mapping the embedding matrix read-only."""
+        with open(directory / METADATA_FILE, "r") as f:
+            metadata = json.load(f)
+        matrix = np.load(directory / EMBEDDINGS_FILE, mmap_mode="r")
+        return cls(
+            matrix,
+            metadata["intent_names"],
+            metadata["row_offsets"],
+            metadata["encoder_name"],
+            metadata["fingerprint"],
+            threshold
+        )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        directory: Path,
+        intents: Dict[str, Any],
+        encoder,
+        threshold: float
+    ) -> "IntentIndex":
+        """Load the persisted index, rebuilding it if intents or the encoder changed."""
+        if (directory / METADATA_FILE).exists() and (directory / EMBEDDINGS_FILE).exists():
+            index = cls.load(directory, threshold)
+            if index.fingerprint == intents_fingerprint(intents) and index.encoder_name == encoder_identity(encoder):
+                return index
+            logger.info("Intent index at %s is stale; rebuilding", directory)
+
+        index = cls.build(intents, encoder, threshold)
+        try:
+            index.save(directory)
+        except OSError:
+            logger.warning("Could not persist intent index to %s", directory, exc_info=True)
+        return index
+
+    def classify(self, vectors: np.ndarray) -> List[Dict[str, Any]]:
+        """Classify a batch of unit-normalized message embeddings."""
+        scores = vectors @ self.matrix.T
+        intent_scores = np.maximum.reduceat(scores, self.row_offsets, axis=1)
+        best = intent_scores.argmax(axis=1)
+
+        results = []
+        for row, column in enumerate(best):
+            confidence = float(intent_scores[row, column])
+            intent = self.intent_names[column] if confidence >= self.threshold else UNKNOWN_INTENT
+            results.append({"intent": intent, "confidence": confidence})
+        return results
@@ -0,0 +1,170 @@
+from typing import Dict, Any, Hashable, List, Optional, Tuple
+from array import array
+from collections import Counter
+import heapq
+import math
+import threading
+from .gazetteer import tokenize
+
+# Words too common in questions to say anything about which record is meant
+STOPWORDS = frozenset(
+    "a an and are at be can do does for from how i in is it me my of on or "
+    "the there this to what when where which who will with you your".split()
+)
+
+def stem(token: str) -> str:
+    """Strip one common English suffix so "printing", "prints" and "print" match."""
+    for suffix in ("ing", "ed", "es", "s"):
+        stripped = token[:-len(suffix)]
+        if not token.endswith(suffix) or len(stripped) < 3:
+            continue
+        if suffix == "es" and not stripped.endswith(("s", "x", "z", "ch", "sh")):
+            # "services" -> "service", but "classes" -> "class"
+            return token[:-1]
+        if suffix == "s" and stripped.endswith(("s", "u", "i")):
+            # Keep "stress", "campus" and "analysis" whole
+            return token
+        return stripped
+    return token
+
+def analyze(text: str) -> List[str]:
+    return [stem(token) for token, _, _ in tokenize(text or "") if token not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over short knowledge-base documents, updatable one document at a time.
+
+    Each term's postings are two parallel compact arrays, document ids
+    (``array('I')``) and term frequencies (``array('H')``). Document
+    frequency and total length are kept up to date as documents come and
+    go, so scores are correct without a rebuild. Removed documents are
+    tombstoned and compacted once they outnumber the live ones.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._df: Counter = Counter()
+        # doc id -> key, None once removed
+        self._keys: List[Optional[Hashable]] = []
+        self._lengths = array("I")
+        self._documents: Dict[Hashable, Tuple[int, str]] = {}
+        self._total_length = 0
+        self._dead = 0
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _index(self, key: Hashable, text: str) -> None:
+        counts = Counter(analyze(text))
+        doc_id = len(self._keys)
+        self._keys.append(key)
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        self._documents[key] = (doc_id, text)
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array("I"), array("H"))
+            posting[0].append(doc_id)
+            posting[1].append(min(tf, 0xFFFF))
+            self._df[term] += 1
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index ``text`` under ``key``, replacing whatever the key held before."""
+        with self._write_lock:
+            if key in self._documents:
+                self._unindex(key)
+            self._index(key, text)
+
+    def remove(self, key: Hashable) -> bool:
+        with self._write_lock:
+            if key not in self._documents:
+                return False
+            self._unindex(key)
+            return True
+
+    def _unindex(self, key: Hashable) -> None:
+        doc_id, text = self._documents.pop(key)
+        for term in set(analyze(text)):
+            self._df[term] -= 1
+            if not self._df[term]:
+                del self._df[term]
+        self._keys[doc_id] = None
+        self._total_length -= self._lengths[doc_id]
+        self._dead += 1
+        if self._dead > len(self._documents):
+            self._compact()
+
+    def copy(self) -> "BM25Index":
+        """An independent copy that can be updated while readers keep using this one."""
+        clone = BM25Index(self.k1, self.b)
+        clone._postings = {term: (ids[:], tfs[:]) for term, (ids, tfs) in self._postings.items()}
+        clone._df = Counter(self._df)
+        clone._keys = list(self._keys)
+        clone._lengths = self._lengths[:]
+        clone._documents = dict(self._documents)
+        clone._total_length = self._total_length
+        clone._dead = self._dead
+        return clone
+
+    def sync(self, documents: Dict[Hashable, str]) -> Tuple[int, int]:
+        """Make the index hold exactly ``documents``, reindexing only those that changed.
+
+        Returns the number of documents (indexed, removed).
+        """
+        stale = [key for key in self._documents if key not in documents]
+        for key in stale:
+            self.remove(key)
+        changed = [
+            key for key, text in documents.items()
+            if key not in self._documents or self._documents[key][1] != text
+        ]
+        for key in changed:
+            self.add(key, documents[key])
+        return len(changed), len(stale)
+
+    def _compact(self) -> None:
+        live = [(key, self._documents[key][1]) for key in self._keys if key is not None]
+        compacted = BM25Index(self.k1, self.b)
+        for key, text in live:
+            compacted._index(key, text)
+        # Take over the rebuilt structures wholesale
+        (self._postings, self._df, self._keys, self._lengths,
+         self._documents, self._total_length, self._dead) = (
+            compacted._postings, compacted._df, compacted._keys, compacted._lengths,
+            compacted._documents, compacted._total_length, 0
+        )
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[Hashable, float]]:
+        """The ``limit`` best-scoring keys for a free-text query, best first."""
+        keys, lengths, postings, df = self._keys, self._lengths, self._postings, self._df
+        live = len(self._documents)
+        if not live:
+            return []
+        average_length = max(self._total_length / live, 1.0)
+
+        scores: Dict[int, float] = {}
+        for term in set(analyze(query)):
+            posting = postings.get(term)
+            frequency = df.get(term, 0)
+            if posting is None or not frequency:
+                continue
+            idf = math.log(1.0 + (live - frequency + 0.5) / (frequency + 0.5))
+            for doc_id, tf in zip(*posting):
+                if doc_id >= len(keys) or keys[doc_id] is None:
+                    continue
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(keys[doc_id], score) for doc_id, score in best]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self._documents),
+            "terms": len(self._df),
+            "tombstones": self._dead
+        }
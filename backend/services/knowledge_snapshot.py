@@ -0,0 +1,437 @@
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import json
+import logging
+import threading
+import time
+from ..models.knowledge import (
+    Department,
+    Program,
+    Faculty,
+    Building,
+    Event,
+    Service,
+    KnowledgeVersion,
+    department_faculty
+)
+from ..core.config import DATA_DIR, ENTITY_MATCH_MIN_SCORE
+from .event_timeline import EventTimeline
+from .gazetteer import normalize
+from .knowledge_search import BM25Index
+from .name_resolver import NameResolver
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class DepartmentRecord:
+    id: int
+    name: str
+    description: Optional[str]
+    location: Optional[str]
+    contact_info: Optional[str]
+
+@dataclass(frozen=True)
+class ProgramRecord:
+    id: int
+    name: str
+    description: Optional[str]
+    degree_type: Optional[str]
+    department_id: Optional[int]
+
+@dataclass(frozen=True)
+class FacultyRecord:
+    id: int
+    name: str
+    title: Optional[str]
+    email: Optional[str]
+    office_location: Optional[str]
+    office_hours: Optional[str]
+
+@dataclass(frozen=True)
+class BuildingRecord:
+    id: int
+    name: str
+    code: Optional[str]
+    location: Optional[str]
+    description: Optional[str]
+    hours: Optional[str]
+
+@dataclass(frozen=True)
+class EventRecord:
+    id: int
+    title: str
+    description: Optional[str]
+    location: Optional[str]
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    organizer: Optional[str]
+    category: Optional[str]
+
+@dataclass(frozen=True)
+class ServiceRecord:
+    id: int
+    name: str
+    description: Optional[str]
+    location: Optional[str]
+    contact_info: Optional[str]
+    hours: Optional[str]
+    category: Optional[str]
+
+def _first(index: Dict[str, Any], names: Iterable[str]) -> Optional[Any]:
+    for name in names:
+        record = index.get(normalize(name))
+        if record is not None:
+            return record
+    return None
+
+@dataclass
+class KnowledgeSnapshot:
+    """Immutable, fully indexed copy of the knowledge tables.
+
+    Lookups are keyed on gazetteer-normalized names, so response generation
+    never needs a database round trip. A snapshot is never mutated after it
+    is built; refreshes build a new one and swap it in.
+
+    Names that miss the exact indexes fall back to ``resolver``, a trigram
+    index, and free-text ``search`` uses ``search_index``. Each refresh
+    copies the previous snapshot's indexes and applies only the rows that
+    changed to the copy, so these too are never mutated once published and
+    always match this snapshot's records.
+    """
+
+    version: Optional[int] = None
+    loaded_at: Optional[datetime] = None
+    departments: Dict[int, DepartmentRecord] = field(default_factory=dict)
+    programs: Dict[int, ProgramRecord] = field(default_factory=dict)
+    faculty: Dict[int, FacultyRecord] = field(default_factory=dict)
+    buildings: Dict[int, BuildingRecord] = field(default_factory=dict)
+    events: Dict[int, EventRecord] = field(default_factory=dict)
+    services: Dict[int, ServiceRecord] = field(default_factory=dict)
+    departments_by_name: Dict[str, DepartmentRecord] = field(default_factory=dict)
+    buildings_by_name: Dict[str, BuildingRecord] = field(default_factory=dict)
+    buildings_by_code: Dict[str, BuildingRecord] = field(default_factory=dict)
+    services_by_name: Dict[str, ServiceRecord] = field(default_factory=dict)
+    events_by_title: Dict[str, EventRecord] = field(default_factory=dict)
+    programs_by_department: Dict[int, Tuple[ProgramRecord, ...]] = field(default_factory=dict)
+    faculty_by_department: Dict[int, Tuple[FacultyRecord, ...]] = field(default_factory=dict)
+    events_timeline: EventTimeline = field(default_factory=lambda: EventTimeline(()))
+    resolver: Optional[NameResolver] = None
+    search_index: Optional[BM25Index] = None
+
+    @classmethod
+    def load(cls, db: Session, version: Optional[int] = None) -> "KnowledgeSnapshot":
+        """Read every knowledge table once and build the secondary indexes."""
+        snapshot = cls(version=version, loaded_at=datetime.utcnow())
+        snapshot.departments = {
+            d.id: DepartmentRecord(d.id, d.name, d.description, d.location, d.contact_info)
+            for d in db.query(Department)
+        }
+        snapshot.programs = {
+            p.id: ProgramRecord(p.id, p.name, p.description, p.degree_type, p.department_id)
+            for p in db.query(Program)
+        }
+        snapshot.faculty = {
+            f.id: FacultyRecord(f.id, f.name, f.title, f.email, f.office_location, f.office_hours)
+            for f in db.query(Faculty)
+        }
+        snapshot.buildings = {
+            b.id: BuildingRecord(b.id, b.name, b.code, b.location, b.description, b.hours)
+            for b in db.query(Building)
+        }
+        snapshot.events = {
+            e.id: EventRecord(
+                e.id, e.title, e.description, e.location, e.start_time, e.end_time, e.organizer, e.category
+            )
+            for e in db.query(Event)
+        }
+        snapshot.services = {
+            s.id: ServiceRecord(s.id, s.name, s.description, s.location, s.contact_info, s.hours, s.category)
+            for s in db.query(Service)
+        }
+        memberships = db.execute(
+            select(department_faculty.c.department_id, department_faculty.c.faculty_id)
+        ).all()
+        snapshot._build_indexes(memberships)
+        return snapshot
+
+    def _build_indexes(self, memberships: List[Tuple[int, int]]) -> None:
+        self.departments_by_name = {normalize(d.name): d for d in self.departments.values() if d.name}
+        self.buildings_by_name = {normalize(b.name): b for b in self.buildings.values() if b.name}
+        self.buildings_by_code = {normalize(b.code): b for b in self.buildings.values() if b.code}
+        self.services_by_name = {normalize(s.name): s for s in self.services.values() if s.name}
+
+        # Earliest occurrence wins when several events share a title
+        events_by_title: Dict[str, EventRecord] = {}
+        for event in sorted(self.events.values(), key=lambda e: (e.start_time or datetime.max, e.id)):
+            if event.title:
+                events_by_title.setdefault(normalize(event.title), event)
+        self.events_by_title = events_by_title
+        self.events_timeline = EventTimeline(self.events.values())
+
+        programs: Dict[int, List[ProgramRecord]] = {}
+        for program in sorted(self.programs.values(), key=lambda p: p.id):
+            programs.setdefault(program.department_id, []).append(program)
+        self.programs_by_department = {dept_id: tuple(items) for dept_id, items in programs.items()}
+
+        faculty: Dict[int, List[FacultyRecord]] = {}
+        for department_id, faculty_id in sorted(memberships):
+            member = self.faculty.get(faculty_id)
+            if member is not None:
+                faculty.setdefault(department_id, []).append(member)
+        self.faculty_by_department = {dept_id: tuple(items) for dept_id, items in faculty.items()}
+
+    def _indexes(self) -> Dict[str, Dict[str, Any]]:
+        # Resolver label -> the exact index its targets are keys of
+        return {
+            "departments": self.departments_by_name,
+            "buildings": self.buildings_by_name,
+            "services": self.services_by_name,
+            "events": self.events_by_title
+        }
+
+    def resolver_entries(self, aliases: Dict[str, Dict[str, str]]) -> List[Tuple[str, str, str]]:
+        """(label, surface, normalized name) terms for the name resolver.
+
+        Building codes and entities.json aliases point at the name they
+        stand for; aliases of names missing from the snapshot are dropped.
+        """
+        entries = [
+            (label, key, key)
+            for label, index in self._indexes().items()
+            for key in index
+        ]
+        entries.extend(
+            ("buildings", code, normalize(b.name)) for code, b in self.buildings_by_code.items() if b.name
+        )
+        for label, index in self._indexes().items():
+            for alias, canonical in aliases.get(label, {}).items():
+                if normalize(canonical) in index:
+                    entries.append((label, alias, normalize(canonical)))
+        return entries
+
+    def candidates(self, label: str, name: str, limit: int = 5) -> List[Tuple[Any, float]]:
+        """Records of one label ranked by similarity to a possibly misspelled name."""
+        index = self._indexes()[label]
+        record = index.get(normalize(name))
+        if record is not None:
+            return [(record, 1.0)]
+        if self.resolver is None:
+            return []
+        ranked = []
+        for key, score in self.resolver.resolve(label, name, limit, ENTITY_MATCH_MIN_SCORE):
+            record = index.get(key)
+            if record is not None:
+                ranked.append((record, score))
+        return ranked
+
+    def _resolve(self, label: str, names: Iterable[str]) -> Optional[Any]:
+        best, best_score = None, 0.0
+        for name in names:
+            ranked = self.candidates(label, name, limit=1)
+            if ranked and ranked[0][1] > best_score:
+                best, best_score = ranked[0]
+        return best
+
+    def search_documents(self) -> Dict[Tuple[str, int], str]:
+        """Searchable text of every record, keyed by (kind, id)."""
+        records = {
+            "departments": ((d.id, d.name, d.description) for d in self.departments.values()),
+            "programs": ((p.id, p.name, f"{p.degree_type or ''} {p.description or ''}") for p in self.programs.values()),
+            "buildings": ((b.id, b.name, f"{b.code or ''} {b.description or ''}") for b in self.buildings.values()),
+            "events": ((e.id, e.title, f"{e.category or ''} {e.description or ''}") for e in self.events.values()),
+            "services": ((s.id, s.name, f"{s.category or ''} {s.description or ''}") for s in self.services.values())
+        }
+        # The name is repeated so that a match on it outweighs one in the description
+        return {
+            (kind, record_id): f"{name or ''} {name or ''} {text or ''}"
+            for kind, rows in records.items()
+            for record_id, name, text in rows
+        }
+
+    def search(self, query: str, limit: int = 3, kinds: Optional[Iterable[str]] = None) -> List[Tuple[str, Any, float]]:
+        """Records best matching a free-text query as (kind, record, score), best first."""
+        if self.search_index is None:
+            return []
+        kinds = set(kinds) if kinds is not None else None
+        # Over-fetch when filtering by kind, since other kinds may take the top places
+        hits = self.search_index.search(query, limit if kinds is None else limit * 4)
+        results = []
+        for (kind, record_id), score in hits:
+            record = getattr(self, kind).get(record_id)
+            if record is not None and (kinds is None or kind in kinds):
+                results.append((kind, record, score))
+        return results[:limit]
+
+    def find_department(self, names: Iterable[str]) -> Optional[DepartmentRecord]:
+        names = list(names)
+        return _first(self.departments_by_name, names) or self._resolve("departments", names)
+
+    def find_building(self, names: Iterable[str]) -> Optional[BuildingRecord]:
+        names = list(names)
+        return (
+            _first(self.buildings_by_name, names)
+            or _first(self.buildings_by_code, names)
+            or self._resolve("buildings", names)
+        )
+
+    def find_service(self, names: Iterable[str]) -> Optional[ServiceRecord]:
+        names = list(names)
+        return _first(self.services_by_name, names) or self._resolve("services", names)
+
+    def find_event(self, titles: Iterable[str]) -> Optional[EventRecord]:
+        titles = list(titles)
+        return _first(self.events_by_title, titles) or self._resolve("events", titles)
+
+    def programs_for(self, department_id: int) -> Tuple[ProgramRecord, ...]:
+        return self.programs_by_department.get(department_id, ())
+
+    def find_faculty(self, department_names: Iterable[str], titles: Iterable[str]) -> Optional[FacultyRecord]:
+        """First faculty member in one of the departments holding one of the titles."""
+        wanted_titles = {normalize(title) for title in titles}
+        for name in department_names:
+            department = self.find_department([name])
+            if department is None:
+                continue
+            for member in self.faculty_by_department.get(department.id, ()):
+                if member.title and normalize(member.title) in wanted_titles:
+                    return member
+        return None
+
+    def gazetteer_terms(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Knowledge-base names as gazetteer (surface, canonical) terms, keyed by label."""
+        buildings: List[Tuple[str, str]] = []
+        for building in self.buildings.values():
+            if building.name:
+                buildings.append((building.name, building.name))
+                if building.code:
+                    buildings.append((building.code, building.name))
+        return {
+            "departments": [(d.name, d.name) for d in self.departments.values() if d.name],
+            "services": [(s.name, s.name) for s in self.services.values() if s.name],
+            "events": sorted({(e.title, e.title) for e in self.events.values() if e.title}),
+            "faculty_roles": sorted({(f.title, f.title) for f in self.faculty.values() if f.title}),
+            "buildings": buildings
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "departments": len(self.departments),
+            "programs": len(self.programs),
+            "faculty": len(self.faculty),
+            "buildings": len(self.buildings),
+            "events": len(self.events),
+            "services": len(self.services)
+        }
+
+_warned_missing_version_table = False
+
+def read_version(db: Session) -> Optional[int]:
+    """Current catalog version, or None if it has never been bumped.
+
+    Databases created before the knowledge_version table existed have no
+    such table until the first ``bump_version``; they read as unversioned.
+    """
+    global _warned_missing_version_table
+    try:
+        return db.query(func.max(KnowledgeVersion.version)).scalar()
+    except DBAPIError:
+        # Postgres aborts the transaction on the failed query
+        db.rollback()
+        if not _warned_missing_version_table:
+            _warned_missing_version_table = True
+            logger.warning("Cannot read the knowledge_version table; treating the catalog as unversioned", exc_info=True)
+        return None
+
+def bump_version(db: Session) -> int:
+    """Increment the catalog version so every worker refreshes its snapshot."""
+    # Existing databases predate the table; create it on first use
+    KnowledgeVersion.__table__.create(db.connection(), checkfirst=True)
+    row = db.query(KnowledgeVersion).order_by(KnowledgeVersion.id).first()
+    if row is None:
+        row = KnowledgeVersion(version=1)
+        db.add(row)
+    else:
+        row.version = (row.version or 0) + 1
+    row.updated_at = datetime.utcnow()
+    db.commit()
+    return row.version
+
+def load_aliases(path: Path = DATA_DIR / "entities.json") -> Dict[str, Dict[str, str]]:
+    """Alias -> canonical name maps from entities.json, keyed by label."""
+    with open(path, "r") as f:
+        entities = json.load(f).get("entities", {})
+    return {label: definition.get("aliases", {}) for label, definition in entities.items()}
+
+class KnowledgeStore:
+    """Holds the current snapshot and swaps in new ones atomically."""
+
+    def __init__(self):
+        self.snapshot = KnowledgeSnapshot()
+        # Indexes of the current snapshot; each refresh updates a copy with only the rows that changed
+        self.resolver = NameResolver()
+        self.aliases = load_aliases()
+        self.resolver_changes: Tuple[int, int] = (0, 0)
+        self.search_index = BM25Index()
+        self.search_changes: Tuple[int, int] = (0, 0)
+        self._refresh_lock = threading.Lock()
+        self._listeners: List[Callable[[KnowledgeSnapshot], None]] = []
+        self.refreshes = 0
+        self.last_refresh_seconds: Optional[float] = None
+
+    def on_refresh(self, listener: Callable[[KnowledgeSnapshot], None]) -> None:
+        """Register a callback that runs with each newly loaded snapshot."""
+        self._listeners.append(listener)
+
+    def refresh(self, db: Session) -> KnowledgeSnapshot:
+        """Reload the snapshot from the database and publish it."""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            snapshot = KnowledgeSnapshot.load(db, read_version(db))
+            # Older snapshots still serve reads from the current indexes, so update copies
+            resolver = self.resolver.copy()
+            self.resolver_changes = resolver.sync(snapshot.resolver_entries(self.aliases))
+            search_index = self.search_index.copy()
+            self.search_changes = search_index.sync(snapshot.search_documents())
+            snapshot.resolver, snapshot.search_index = resolver, search_index
+            for listener in self._listeners:
+                listener(snapshot)
+            # Single reference assignment: readers see either the old or the new snapshot
+            self.snapshot = snapshot
+            self.resolver, self.search_index = resolver, search_index
+            self.refreshes += 1
+            self.last_refresh_seconds = time.perf_counter() - started
+            logger.info("Loaded knowledge snapshot v%s in %.3fs", snapshot.version, self.last_refresh_seconds)
+            return snapshot
+
+    def refresh_if_stale(self, db: Session) -> bool:
+        """Refresh only if the catalog version changed since the last load."""
+        if self.refreshes and read_version(db) == self.snapshot.version:
+            return False
+        self.refresh(db)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.snapshot.stats(),
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "resolver": {
+                **self.resolver.stats(),
+                "last_added": self.resolver_changes[0],
+                "last_removed": self.resolver_changes[1]
+            },
+            "search": {
+                **self.search_index.stats(),
+                "last_indexed": self.search_changes[0],
+                "last_removed": self.search_changes[1]
+            }
+        }
+
+knowledge_store = KnowledgeStore()
@@ -0,0 +1,330 @@
+from typing import Dict, Any, Callable, List, Optional, Set
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import logging
+import time
+from ..core.config import (
+    PERSISTENCE_MAX_ATTEMPTS,
+    PERSISTENCE_MAX_BATCH,
+    PERSISTENCE_MAX_DELAY_MS,
+    PERSISTENCE_WRITE_BEHIND
+)
+from ..core.metrics import FLUSH_SECONDS
+from ..core.stats import percentile
+from ..models.base import AsyncSessionLocal
+from ..models.user import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PendingTurn:
+    """One chat turn waiting to be written: two messages plus the new context."""
+    conversation_id: int
+    user_message_id: int
+    bot_message_id: int
+    user_text: str
+    bot_text: str
+    context: str
+    timestamp: datetime
+    enqueued_at: float
+    attempts: int = 0
+
+def _is_transient(exc: Exception) -> bool:
+    """Whether a write failed because of the database connection rather than the data."""
+    return isinstance(exc, (OperationalError, InterfaceError, ConnectionError, asyncio.TimeoutError, OSError))
+
+class MessageIdAllocator:
+    """Hands out message primary keys before the rows are inserted.
+
+    On Postgres, ids are reserved in blocks from the table's sequence, so
+    any number of workers can allocate safely. Other databases fall back to
+    a counter seeded from MAX(id), which is only safe for a single process.
+    """
+
+    def __init__(self, block_size: int = 256):
+        self.block_size = block_size
+        self._available: deque = deque()
+        self._next_local: Optional[int] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def allocate(self, db: AsyncSession, count: int) -> List[int]:
+        # Created lazily so the lock binds to the serving event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if db.bind.dialect.name == "postgresql":
+                if len(self._available) < count:
+                    result = await db.execute(
+                        text(
+                            "SELECT nextval(pg_get_serial_sequence('messages', 'id')) "
+                            "FROM generate_series(1, :n)"
+                        ),
+                        {"n": max(count, self.block_size)}
+                    )
+                    self._available.extend(result.scalars().all())
+                return [self._available.popleft() for _ in range(count)]
+
+            if self._next_local is None:
+                self._next_local = (await db.scalar(select(func.max(Message.id)))) or 0
+            ids = list(range(self._next_local + 1, self._next_local + 1 + count))
+            self._next_local += count
+            return ids
+
+class MessageWriter:
+    """Write-behind persistence of chat turns.
+
+    Turns are queued in memory and flushed in one transaction with bulk
+    inserts and updates once ``max_batch`` turns are pending or the oldest
+    has waited ``max_delay_ms``. ``stop()`` flushes everything still queued,
+    so a clean shutdown never loses a turn.
+
+    If a batch fails with a data error, its turns are retried one at a time
+    so one bad turn cannot hold back the others. A turn that fails
+    ``max_attempts`` times is dropped and logged in full. Connection errors
+    leave every turn queued for the next flush.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        max_batch: int = 200,
+        max_delay_ms: float = 50,
+        enabled: bool = True,
+        max_attempts: int = 3,
+        stats_window: int = 1024
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay_ms / 1000.0
+        self.enabled = enabled
+        self.max_attempts = max(1, max_attempts)
+        self.id_allocator = MessageIdAllocator()
+        self._queue: deque = deque()
+        self._pending_messages: Set[int] = set()
+        self._pending_contexts: Dict[int, str] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.turns_written = 0
+        self.turns_dropped = 0
+        self._batch_sizes: Counter = Counter()
+        self._lag_ms: deque = deque(maxlen=stats_window)
+
+    def _ensure_primitives(self) -> None:
+        # Created lazily so they bind to the serving event loop
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        self._ensure_primitives()
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and durably write everything still queued."""
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        # Release loop-bound state so the writer can be restarted on a new loop
+        self._flush_lock = None
+        self._wakeup = None
+        self.id_allocator = MessageIdAllocator()
+
+    async def allocate_message_ids(self, db: AsyncSession, count: int) -> List[int]:
+        return await self.id_allocator.allocate(db, count)
+
+    async def submit(self, turn: PendingTurn) -> None:
+        """Queue a turn; with write-behind disabled it is written before returning."""
+        self._queue.append(turn)
+        self._pending_messages.update((turn.user_message_id, turn.bot_message_id))
+        self._pending_contexts[turn.conversation_id] = turn.context
+
+        if not self.enabled:
+            await self.flush()
+            if turn in self._queue:
+                raise RuntimeError(f"Could not write the turn of conversation {turn.conversation_id}")
+            return
+        self.start()
+        # The first queued turn starts the max_delay timer; a full batch flushes at once
+        if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+
+    def pending_context(self, conversation_id: int) -> Optional[str]:
+        """Latest context of a conversation that has not been written yet."""
+        return self._pending_contexts.get(conversation_id)
+
+    def is_pending(self, message_id: int) -> bool:
+        return message_id in self._pending_messages
+
+    def has_pending_conversation(self, conversation_id: int) -> bool:
+        return conversation_id in self._pending_contexts
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self._queue[0].enqueued_at + self.max_delay - time.monotonic()
+            if wait > 0 and len(self._queue) < self.max_batch:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.flush()
+            except Exception:
+                # Turns stay queued; back off before retrying
+                await asyncio.sleep(min(1.0, self.max_delay * 10))
+                continue
+            if self._queue and self._queue[0].attempts:
+                # Only turns that just failed are left; give them a moment before the next attempt
+                await asyncio.sleep(min(1.0, self.max_delay * 10))
+
+    async def flush(self) -> None:
+        """Write every queued turn now, in batches of at most ``max_batch``.
+
+        Raises if the database cannot be reached. Turns that failed with a
+        data error and have attempts left stay queued without raising.
+        """
+        self._ensure_primitives()
+        async with self._flush_lock:
+            # Failed turns are kept at the head of the queue and skipped for this flush
+            retry_later = 0
+            while len(self._queue) > retry_later:
+                end = min(retry_later + self.max_batch, len(self._queue))
+                batch = [self._queue[i] for i in range(retry_later, end)]
+                try:
+                    await self._write(batch)
+                except Exception as exc:
+                    self.failed_flushes += 1
+                    if _is_transient(exc):
+                        logger.warning("Failed to flush %d chat turns; will retry", len(batch), exc_info=True)
+                        raise
+                    logger.exception("Failed to flush %d chat turns; retrying them one by one", len(batch))
+                    retry_later += await self._write_each(batch)
+                    continue
+                self._finish(batch, written=True)
+                self.flushes += 1
+                self._batch_sizes[len(batch)] += 1
+
+    async def _write_each(self, batch: List[PendingTurn]) -> int:
+        """Write turns one by one; returns how many failed but have attempts left."""
+        failed = 0
+        for turn in batch:
+            try:
+                await self._write([turn])
+            except Exception as exc:
+                if _is_transient(exc):
+                    raise
+                turn.attempts += 1
+                if turn.attempts < self.max_attempts:
+                    failed += 1
+                    continue
+                logger.error(
+                    "Dropping chat turn of conversation %d (messages %d, %d) after %d failed writes: %r",
+                    turn.conversation_id, turn.user_message_id, turn.bot_message_id, turn.attempts, turn,
+                    exc_info=True
+                )
+                self._finish([turn], written=False)
+                continue
+            self._finish([turn], written=True)
+            self.flushes += 1
+            self._batch_sizes[1] += 1
+        return failed
+
+    def _finish(self, turns: List[PendingTurn], written: bool) -> None:
+        """Take turns off the queue once they are written or dropped."""
+        if self._queue and self._queue[0] is turns[0]:
+            for _ in turns:
+                self._queue.popleft()
+        else:
+            for turn in turns:
+                self._queue.remove(turn)
+        finished_at = time.monotonic()
+        still_queued = {turn.conversation_id for turn in self._queue}
+        for turn in turns:
+            self._pending_messages.discard(turn.user_message_id)
+            self._pending_messages.discard(turn.bot_message_id)
+            if turn.conversation_id not in still_queued:
+                self._pending_contexts.pop(turn.conversation_id, None)
+            if written:
+                self._lag_ms.append((finished_at - turn.enqueued_at) * 1000)
+        if written:
+            self.turns_written += len(turns)
+        else:
+            self.turns_dropped += len(turns)
+
+    async def _write(self, batch: List[PendingTurn]) -> None:
+        messages: List[Dict[str, Any]] = []
+        conversations: Dict[int, Dict[str, Any]] = {}
+        for turn in batch:
+            messages.append({
+                "id": turn.user_message_id,
+                "conversation_id": turn.conversation_id,
+                "content": turn.user_text,
+                "is_user": True,
+                "timestamp": turn.timestamp
+            })
+            messages.append({
+                "id": turn.bot_message_id,
+                "conversation_id": turn.conversation_id,
+                "content": turn.bot_text,
+                "is_user": False,
+                "timestamp": turn.timestamp
+            })
+            # Later turns of the same conversation overwrite earlier ones
+            conversations[turn.conversation_id] = {
+                "id": turn.conversation_id,
+                "context": turn.context,
+                "last_activity": turn.timestamp
+            }
+
+        with FLUSH_SECONDS.time():
+            async with self.session_factory() as db:
+                await db.execute(insert(Message), messages)
+                await db.execute(update(Conversation), list(conversations.values()))
+                await db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lags = list(self._lag_ms)
+        return {
+            "write_behind": self.enabled,
+            "queued_turns": len(self._queue),
+            "oldest_queued_ms": (time.monotonic() - self._queue[0].enqueued_at) * 1000 if self._queue else 0.0,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "turns_written": self.turns_written,
+            "turns_dropped": self.turns_dropped,
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+            "lag_ms": {
+                "p50": percentile(lags, 0.50),
+                "p99": percentile(lags, 0.99),
+                "max": max(lags) if lags else None
+            }
+        }
+
+message_writer = MessageWriter(
+    AsyncSessionLocal,
+    PERSISTENCE_MAX_BATCH,
+    PERSISTENCE_MAX_DELAY_MS,
+    PERSISTENCE_WRITE_BEHIND,
+    PERSISTENCE_MAX_ATTEMPTS
+)
@@ -0,0 +1,77 @@
+from typing import Dict, Any, Callable, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """Process-wide registry that loads each NLP pipeline exactly once."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pipelines: Dict[Tuple[str, str], Any] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._nlp_service = None
+        self.warm = False
+        self.warmup_seconds: Optional[float] = None
+
+    def get_pipeline(self, task: str, model_name: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached pipeline for (task, model_name), loading it on first use."""
+        key = (task, model_name)
+        pipeline = self._pipelines.get(key)
+        if pipeline is not None:
+            return pipeline
+
+        with self._lock:
+            pipeline = self._pipelines.get(key)
+            if pipeline is None:
+                started = time.perf_counter()
+                pipeline = loader()
+                elapsed = time.perf_counter() - started
+                self._pipelines[key] = pipeline
+                self._load_seconds[f"{task}:{model_name}"] = elapsed
+                logger.info("Loaded %s pipeline %s in %.2fs", task, model_name, elapsed)
+        return pipeline
+
+    def get_nlp_service(self):
+        """Return the shared NLPService, constructing it on first use."""
+        if self._nlp_service is not None:
+            return self._nlp_service
+
+        with self._lock:
+            if self._nlp_service is None:
+                from .nlp_service import NLPService
+                self._nlp_service = NLPService(registry=self)
+        return self._nlp_service
+
+    def loaded_nlp_service(self):
+        """Return the shared NLPService if it has been built, without building it."""
+        return self._nlp_service
+
+    def warm_up(self, text: str) -> None:
+        """Load all models and run one inference so the first request is not cold."""
+        nlp_service = self.get_nlp_service()
+        started = time.perf_counter()
+        nlp_service.warm_up(text)
+        self.warmup_seconds = time.perf_counter() - started
+        self.warm = True
+        logger.info("NLP warm-up finished in %.2fs", self.warmup_seconds)
+
+    def status(self) -> Dict[str, Any]:
+        """Report load times and warm/cold state for health checks."""
+        return {
+            "state": "warm" if self.warm else "cold",
+            "loaded_models": sorted(self._load_seconds),
+            "load_seconds": dict(self._load_seconds),
+            "warmup_seconds": self.warmup_seconds,
+            "batching": self._nlp_service.batching_stats() if self._nlp_service else None,
+            "cache": self._nlp_service.cache_stats() if self._nlp_service else None,
+            "pipeline": self._nlp_service.pipeline_stats() if self._nlp_service else None
+        }
+
+model_registry = ModelRegistry()
+
+def get_nlp_service():
+    """Return the process-wide NLPService instance."""
+    return model_registry.get_nlp_service()
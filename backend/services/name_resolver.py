@@ -0,0 +1,188 @@
+from typing import Dict, Any, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+from array import array
+from collections import Counter
+import threading
+from .gazetteer import normalize, tokenize
+from .knowledge_search import STOPWORDS
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of the normalized text, padded so word edges count."""
+    padded = f" {normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(a: str, b: str) -> float:
+    """Dice coefficient of the trigram sets of two phrases."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2.0 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+class NameResolver:
+    """Typo-tolerant name lookup over a character-trigram inverted index.
+
+    Each indexed name is a (label, surface, target) term. Postings are
+    compact ``array('I')`` lists of term ids per trigram. A query scores
+    only the terms sharing at least one trigram with it, using the Dice
+    coefficient of the two trigram sets, so exact names score 1.0 and
+    "libary" still finds "Library". Terms are added and removed one at a
+    time. Removed ids are tombstoned and compacted once they outnumber the
+    live ones.
+
+    ``scan`` finds misspelled names inside a whole message by resolving its
+    word n-grams against terms with the same number of words.
+    """
+
+    def __init__(self):
+        # (terms, postings) in one attribute, so a reader loads a matching pair at once.
+        # terms: term id -> (label, normalized surface, target, trigram count), None once removed;
+        # postings: trigram -> term ids. Writers only append in place; compaction swaps the pair.
+        self._index: Tuple[List[Optional[Tuple[str, str, Hashable, int]]], Dict[str, array]] = ([], {})
+        self._ids: Dict[Tuple[str, str, Hashable], int] = {}
+        self._dead = 0
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, label: str, surface: str, target: Hashable) -> bool:
+        key = (label, normalize(surface), target)
+        if not key[1]:
+            return False
+        with self._write_lock:
+            if key in self._ids:
+                return False
+            grams = trigrams(key[1])
+            terms, postings = self._index
+            term_id = len(terms)
+            # The term goes in before its postings, so readers never find an id they cannot look up
+            terms.append((label, key[1], target, len(grams)))
+            self._ids[key] = term_id
+            for gram in grams:
+                postings.setdefault(gram, array("I")).append(term_id)
+            return True
+
+    def remove(self, label: str, surface: str, target: Hashable) -> bool:
+        with self._write_lock:
+            term_id = self._ids.pop((label, normalize(surface), target), None)
+            if term_id is None:
+                return False
+            self._index[0][term_id] = None
+            self._dead += 1
+            if self._dead > len(self._ids):
+                self._compact()
+            return True
+
+    def copy(self) -> "NameResolver":
+        """An independent copy that can be updated while readers keep using this one."""
+        clone = NameResolver()
+        terms, postings = self._index
+        clone._index = (list(terms), {gram: ids[:] for gram, ids in postings.items()})
+        clone._ids = dict(self._ids)
+        clone._dead = self._dead
+        return clone
+
+    def sync(self, entries: Iterable[Tuple[str, str, Hashable]]) -> Tuple[int, int]:
+        """Make the index hold exactly ``entries``, touching only the terms that changed.
+
+        Returns the number of terms (added, removed).
+        """
+        wanted = {(label, normalize(surface), target) for label, surface, target in entries}
+        stale = [key for key in self._ids if key not in wanted]
+        removed = sum(self.remove(*key) for key in stale)
+        added = sum(self.add(*key) for key in wanted if key not in self._ids)
+        return added, removed
+
+    def _compact(self) -> None:
+        live = [term for term in self._index[0] if term is not None]
+        postings: Dict[str, array] = {}
+        ids: Dict[Tuple[str, str, Hashable], int] = {}
+        for term_id, (label, surface, target, _) in enumerate(live):
+            ids[(label, surface, target)] = term_id
+            for gram in trigrams(surface):
+                postings.setdefault(gram, array("I")).append(term_id)
+        # One assignment publishes the new terms and postings together
+        self._index = (live, postings)
+        self._ids, self._dead = ids, 0
+
+    def resolve(
+        self,
+        label: Optional[str],
+        query: str,
+        limit: int = 5,
+        min_score: float = 0.0
+    ) -> List[Tuple[Hashable, float]]:
+        """Best-scoring targets for a query, optionally restricted to one label."""
+        best: Dict[Hashable, float] = {}
+        for term, score in self._score(query, self._index):
+            if label is not None and term[0] != label:
+                continue
+            if score >= min_score and score > best.get(term[2], 0.0):
+                best[term[2]] = score
+        return sorted(best.items(), key=lambda item: -item[1])[:limit]
+
+    def scan(
+        self,
+        text: str,
+        min_score: float,
+        max_words: int = 3,
+        min_chars: int = 4
+    ) -> List[Tuple[int, int, str, Hashable, float]]:
+        """Misspelled names in free text as (start, end, label, target, score) spans.
+
+        Every run of up to ``max_words`` tokens with at least ``min_chars``
+        characters, not starting or ending with a stopword, is scored against
+        terms of the same word count whose words each match in turn, so
+        "semester over" does not match "Fall Semester". Overlapping spans
+        keep the best score. Spans are returned in text order.
+        """
+        tokens = tokenize(text)
+        # Every window is scored against the same index, even if a compaction swaps it meanwhile
+        index = self._index
+        found = []
+        for words in range(1, max_words + 1):
+            for first in range(len(tokens) - words + 1):
+                words_in_window = [token for token, _, _ in tokens[first:first + words]]
+                window = " ".join(words_in_window)
+                if len(window) < min_chars or words_in_window[0] in STOPWORDS or words_in_window[-1] in STOPWORDS:
+                    continue
+                best = None
+                for term, score in self._score(window, index):
+                    if score < min_score or (best is not None and score <= best[1]):
+                        continue
+                    term_words = term[1].split(" ")
+                    if len(term_words) == words and all(
+                        similarity(word, term_word) >= min_score
+                        for word, term_word in zip(words_in_window, term_words)
+                    ):
+                        best = (term, score)
+                if best is not None:
+                    found.append((best[1], first, first + words - 1, best[0][0], best[0][2]))
+
+        selected = []
+        taken: Set[int] = set()
+        for score, first, last, label, target in sorted(found, key=lambda item: -item[0]):
+            if taken.isdisjoint(range(first, last + 1)):
+                taken.update(range(first, last + 1))
+                selected.append((tokens[first][1], tokens[last][2], label, target, score))
+        return sorted(selected, key=lambda span: span[0])
+
+    def _score(self, query: str, index) -> Iterator[Tuple[Tuple[str, str, Hashable, int], float]]:
+        """Every live term of ``index`` sharing a trigram with the query, with its Dice score."""
+        grams = trigrams(query)
+        if not grams:
+            return
+        terms, postings = index
+        overlaps: Counter = Counter()
+        for gram in grams:
+            overlaps.update(postings.get(gram, ()))
+        for term_id, overlap in overlaps.items():
+            term = terms[term_id] if term_id < len(terms) else None
+            if term is not None:
+                yield term, 2.0 * overlap / (len(grams) + term[3])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "terms": len(self._ids),
+            "trigrams": len(self._index[1]),
+            "tombstones": self._dead
+        }
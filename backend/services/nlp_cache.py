@@ -0,0 +1,176 @@
+from typing import Dict, Any, List, Optional
+from bisect import bisect_right
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import threading
+import time
+from .gazetteer import normalize, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the shape of a cached entry changes, so shared entries in the old shape are never read
+ENTRY_FORMAT = 2
+
+def cache_fingerprint(*parts: Any) -> str:
+    """Hash everything an NLP result depends on into a short version tag."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def realign_entities(source: str, text: str, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of entities found in ``source``, with offsets moved onto ``text``.
+
+    Both texts must share a normalized form, so they have the same tokens at
+    different offsets and possibly in different case. Each offset is carried
+    over relative to the token it falls in. NER words are surface text, so
+    they are re-read from ``text``; gazetteer and fuzzy words are canonical
+    names and stay as they are.
+    """
+    if text == source:
+        return [dict(e) for e in entities]
+    source_tokens = tokenize(source)
+    tokens = tokenize(text)
+    if not tokens or len(tokens) != len(source_tokens):
+        return [dict(e) for e in entities]
+
+    starts = [start for _, start, _ in source_tokens]
+
+    def move(offset: int) -> int:
+        position = max(0, bisect_right(starts, offset) - 1)
+        return min(max(0, tokens[position][1] + offset - source_tokens[position][1]), len(text))
+
+    realigned = []
+    for entity in entities:
+        start = move(entity["start"])
+        # The end is exclusive, so move the last character it covers
+        end = max(start, move(entity["end"] - 1) + 1) if entity["end"] > entity["start"] else start
+        moved = dict(entity, start=start, end=end)
+        if entity.get("source") == "ner":
+            moved["word"] = text[start:end]
+        realigned.append(moved)
+    return realigned
+
+class NLPResultCache:
+    """Bounded LRU + TTL cache of NLP results keyed on normalized message text.
+
+    Texts that differ only in case, spacing or punctuation share an entry,
+    so an entry keeps the raw text that filled it and callers realign its
+    entity offsets with ``realign_entities``.
+
+    Keys are prefixed with a fingerprint of the intents, entities and model
+    versions, so changing any of them makes every earlier entry unreachable,
+    both locally and in the optional shared Redis backend.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl_seconds: float = 3600,
+        redis_url: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fingerprint = ""
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = self._connect(redis_url) if redis_url else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+
+    @staticmethod
+    def _connect(redis_url: str):
+        try:
+            import redis
+        except ImportError:
+            logger.warning("NLP_CACHE_REDIS_URL is set but redis is not installed; using local cache only")
+            return None
+        return redis.Redis.from_url(redis_url, socket_timeout=0.05)
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Switch to a new version tag, dropping every locally cached entry."""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.fingerprint = fingerprint
+
+    def _key(self, text: str) -> str:
+        return f"nlp:{ENTRY_FORMAT}:{self.fingerprint}:{normalize(text)}"
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        key = self._key(text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        value = self._get_shared(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._store_local(key, value)
+        return value
+
+    def put(self, text: str, value: Dict[str, Any]) -> None:
+        key = self._key(text)
+        self._store_local(key, value)
+        if self._shared is not None:
+            try:
+                self._shared.setex(key, int(self.ttl_seconds), json.dumps(value))
+            except Exception:
+                self.shared_errors += 1
+                logger.debug("Shared NLP cache write failed", exc_info=True)
+
+    def _store_local(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._shared is None:
+            return None
+        try:
+            raw = self._shared.get(key)
+        except Exception:
+            self.shared_errors += 1
+            logger.debug("Shared NLP cache read failed", exc_info=True)
+            return None
+        return json.loads(raw) if raw else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "fingerprint": self.fingerprint,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "shared": self._shared is not None,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "shared_errors": self.shared_errors
+            }
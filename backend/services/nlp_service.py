@@ -1,29 +1,169 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import json
+import time
 from pathlib import Path
+from ..core.config import (
+    ENTITY_SCAN_MIN_SCORE,
+    INTENT_ENCODER_NAME,
+    INTENT_INDEX_DIR,
+    INTENT_CONFIDENCE_THRESHOLD,
+    MODEL_ARTIFACT_DIR,
+    NLP_BACKEND,
+    NLP_INTRA_OP_THREADS,
+    NLP_INTER_OP_THREADS,
+    NER_MODEL_NAME,
+    NER_FALLBACK_ENABLED,
+    NLP_BATCHING_ENABLED,
+    NLP_BATCH_MAX_SIZE,
+    NLP_BATCH_MAX_WAIT_MS,
+    NLP_CONTEXT_NER,
+    NLP_CACHE_ENABLED,
+    NLP_CACHE_MAX_ENTRIES,
+    NLP_CACHE_TTL_SECONDS,
+    NLP_CACHE_REDIS_URL,
+    NLP_MODEL_VERSION,
+    NLP_PIPELINE_MODE,
+    NLP_SPECULATIVE_NER_SHARE
+)
+from ..core.metrics import StageTimer
+from .conversation_context import ContextVocabulary, ConversationContext
+from .encoder import SentenceEncoder
+from .gazetteer import Gazetteer, domain_terms
+from .inference_backends import TOKEN_CLASSIFICATION, load_model, validate_backend
+from .inference_scheduler import BatchScheduler
+from .intent_index import IntentIndex, UNKNOWN_INTENT
+from .model_registry import ModelRegistry, model_registry
+from .name_resolver import NameResolver
+from .nlp_cache import NLPResultCache, cache_fingerprint, realign_entities
+from .pipeline_planner import PipelinePlanner
+
+# CoNLL labels emitted by the fallback NER model, mapped onto our entity labels
+NER_LABEL_MAP = {
+    "LOC": "buildings",
+    "ORG": "departments"
+}
 
 class NLPService:
-    def __init__(self):
-        # Initialize the intent classification model
-        self.intent_classifier = pipeline(
-            "text-classification",
-            model="distilbert-base-uncased",
-            tokenizer="distilbert-base-uncased"
+    def __init__(self, registry: ModelRegistry = model_registry, backend: str = NLP_BACKEND):
+        self.registry = registry
+        self.backend = validate_backend(backend)
+        
+        # Sentence encoder behind the nearest-example intent index (loaded once per process)
+        self.encoder = registry.get_pipeline(
+            "feature-extraction",
+            f"{INTENT_ENCODER_NAME}@{self.backend}",
+            lambda: SentenceEncoder(
+                INTENT_ENCODER_NAME,
+                self.backend,
+                MODEL_ARTIFACT_DIR,
+                NLP_INTRA_OP_THREADS,
+                NLP_INTER_OP_THREADS
+            )
         )
         
-        # Initialize the entity recognition model
-        self.ner_model = pipeline(
-            "ner",
-            model="dbmdz/bert-large-cased-finetuned-conll03-english",
-            tokenizer="dbmdz/bert-large-cased-finetuned-conll03-english"
+        # Batch concurrent requests into one padded forward pass per model
+        self.intent_scheduler = BatchScheduler(
+            "intent", self._classify_batch, NLP_BATCH_MAX_SIZE, NLP_BATCH_MAX_WAIT_MS
+        )
+        self.ner_scheduler = BatchScheduler(
+            "ner", self._extract_batch, NLP_BATCH_MAX_SIZE, NLP_BATCH_MAX_WAIT_MS
+        )
+        
+        # Runs NER only for intents that read its labels, overlapping it with classification when worthwhile
+        self.planner = PipelinePlanner(
+            NER_LABEL_MAP.values(), NLP_PIPELINE_MODE, NLP_SPECULATIVE_NER_SHARE,
+            keep_context_entities=NLP_CONTEXT_NER
         )
         
         # Load university-specific intents and entities
         self.intents = self._load_intents()
         self.entities = self._load_entities()
         
+        # Precomputed example matrix; rebuilt only when intents.json or the encoder changes
+        self.intent_index = IntentIndex.load_or_build(
+            INTENT_INDEX_DIR, self.intents, self.encoder, INTENT_CONFIDENCE_THRESHOLD
+        )
+        
+        # Compiled domain vocabulary used as the fast path for entity extraction,
+        # with a trigram index of the same phrases for misspelled names
+        self.knowledge_terms: Dict[str, List[Tuple[str, str]]] = {}
+        self._load_vocabulary()
+        self.context_vocabulary = self._build_context_vocabulary()
+        
+        # Results for repeated questions, invalidated whenever data or models change
+        self.result_cache = NLPResultCache(
+            NLP_CACHE_MAX_ENTRIES, NLP_CACHE_TTL_SECONDS, NLP_CACHE_REDIS_URL
+        )
+        self.result_cache.set_fingerprint(self._cache_fingerprint())
+    
+    @property
+    def ner_model(self):
+        """Transformer NER fallback, loaded on first use (once per process)."""
+        return self.registry.get_pipeline(
+            "ner",
+            f"{NER_MODEL_NAME}@{self.backend}",
+            self._load_ner_pipeline
+        )
+    
+    def _load_ner_pipeline(self):
+        # Imported here so that importing this module stays cheap
+        from transformers import pipeline
+        
+        tokenizer, model = load_model(
+            TOKEN_CLASSIFICATION,
+            NER_MODEL_NAME,
+            self.backend,
+            MODEL_ARTIFACT_DIR,
+            NLP_INTRA_OP_THREADS,
+            NLP_INTER_OP_THREADS
+        )
+        return pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+    
+    def load_knowledge_terms(self, terms: Dict[str, List[Tuple[str, str]]]) -> None:
+        """Rebuild the gazetteer and name resolver with knowledge-base names and swap them in."""
+        self.knowledge_terms = terms
+        self._load_vocabulary()
+        self.context_vocabulary = self._build_context_vocabulary()
+        self.result_cache.set_fingerprint(self._cache_fingerprint())
+    
+    def _load_vocabulary(self) -> None:
+        terms = domain_terms(self.entities, self.knowledge_terms)
+        resolver = NameResolver()
+        for label, phrases in terms.items():
+            for surface, canonical in phrases:
+                resolver.add(label, surface, canonical)
+        self.gazetteer = Gazetteer(terms)
+        self.name_resolver = resolver
+    
+    def _build_context_vocabulary(self) -> ContextVocabulary:
+        entity_definitions = self.entities.get("entities", {})
+        values = [
+            example
+            for definition in entity_definitions.values()
+            for example in definition.get("examples", [])
+        ]
+        values.extend(canonical for phrases in self.knowledge_terms.values() for _, canonical in phrases)
+        return ContextVocabulary(
+            list(self.intents.get("intents", {})) + [UNKNOWN_INTENT],
+            list(entity_definitions) + ["LOC", "ORG", "PER", "MISC"],
+            values
+        )
+    
+    def _cache_fingerprint(self) -> str:
+        return cache_fingerprint(
+            self.intents,
+            self.entities,
+            self.knowledge_terms,
+            INTENT_ENCODER_NAME,
+            NER_MODEL_NAME,
+            self.backend,
+            NLP_MODEL_VERSION,
+            INTENT_CONFIDENCE_THRESHOLD,
+            ENTITY_SCAN_MIN_SCORE,
+            NER_FALLBACK_ENABLED,
+            NLP_CONTEXT_NER
+        )
+
     def _load_intents(self) -> Dict[str, Any]:
         # Load intents from a JSON file
         intents_path = Path(__file__).parent.parent / "data" / "intents.json"
@@ -40,26 +180,117 @@ class NLPService:
                 return json.load(f)
         return {}
     
-    def classify_intent(self, text: str) -> Dict[str, Any]:
-        """Classify the intent of the user's message."""
-        result = self.intent_classifier(text)[0]
-        return {
-            "intent": result["label"],
-            "confidence": result["score"]
-        }
+    def _classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        # One padded encoder pass, then one matrix product against every example
+        return self.intent_index.classify(self.encoder.encode(texts))
+    
+    def _extract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        return self.ner_model(texts, batch_size=len(texts))
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return hit, miss and eviction counters of the result cache."""
+        return {"enabled": NLP_CACHE_ENABLED, **self.result_cache.stats()}
+    
+    def pipeline_stats(self) -> Dict[str, Any]:
+        return self.planner.stats()
     
-    def extract_entities(self, text: str) -> Dict[str, Any]:
-        """Extract relevant entities from the user's message."""
-        entities = self.ner_model(text)
+    def batching_stats(self) -> Dict[str, Any]:
+        """Return per-model batch size and queue wait statistics."""
         return {
-            "entities": entities,
-            "text": text
+            "enabled": NLP_BATCHING_ENABLED,
+            "intent": self.intent_scheduler.stats(),
+            "ner": self.ner_scheduler.stats()
         }
     
-    def process_message(self, text: str) -> Dict[str, Any]:
-        """Process a user message and return intent and entities."""
-        intent_result = self.classify_intent(text)
-        entity_result = self.extract_entities(text)
+    def classify_intent(self, text: str) -> Dict[str, Any]:
+        """Classify the intent of the user's message.
+        
+        Returns "unknown" when no intent example is similar enough, which
+        routes the message to the fallback response.
+        """
+        if NLP_BATCHING_ENABLED:
+            return self.intent_scheduler(text)
+        return self._classify_batch([text])[0]
+    
+    def _run_ner(self, text: str) -> List[Dict[str, Any]]:
+        if NLP_BATCHING_ENABLED:
+            raw_entities = self.ner_scheduler(text)
+        else:
+            raw_entities = self.ner_model(text)
+        return self._map_ner_entities(raw_entities)
+    
+    def _match_entities(self, text: str) -> List[Dict[str, Any]]:
+        """Gazetteer matches, or misspelled domain names when the gazetteer finds none."""
+        entities = self.gazetteer.match(text)
+        if entities:
+            return entities
+        return [
+            {
+                "entity": label,
+                "word": canonical,
+                "score": score,
+                "start": start,
+                "end": end,
+                "source": "fuzzy"
+            }
+            for start, end, label, canonical, score in self.name_resolver.scan(text, ENTITY_SCAN_MIN_SCORE)
+        ]
+    
+    def _map_ner_entities(self, raw_entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "entity": NER_LABEL_MAP.get(e["entity_group"], e["entity_group"]),
+                "word": e["word"],
+                "score": float(e["score"]),
+                "start": e["start"],
+                "end": e["end"],
+                "source": "ner"
+            }
+            for e in raw_entities
+        ]
+    
+    def process_message(self, text: str, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Process a user message and return intent and entities.
+        
+        Stage timings are added to ``timer`` when the caller passes one;
+        otherwise they are published here, labelled with the intent.
+        """
+        if timer is None:
+            local_timer = StageTimer()
+            result = self.process_message(text, local_timer)
+            local_timer.observe(result["intent"]["intent"])
+            return result
+        
+        if NLP_CACHE_ENABLED:
+            with timer.stage("cache_lookup"):
+                cached = self.result_cache.get(text)
+            if cached is not None:
+                return {
+                    "intent": dict(cached["intent"]),
+                    "entities": {
+                        "entities": realign_entities(cached["text"], text, cached["entities"]),
+                        "text": text
+                    },
+                    "original_text": text
+                }
+        
+        with timer.stage("gazetteer"):
+            entities = self._match_entities(text)
+        if entities or not NER_FALLBACK_ENABLED:
+            with timer.stage("intent_classification"):
+                intent_result = self.classify_intent(text)
+            if entities:
+                self.planner.record_gazetteer_hit(intent_result["intent"])
+        else:
+            intent_result, entities = self._classify_with_ner(text, timer)
+        entity_result = {"entities": entities, "text": text}
+        
+        if NLP_CACHE_ENABLED:
+            self.result_cache.put(text, {
+                "text": text,
+                "intent": dict(intent_result),
+                "entities": [dict(e) for e in entity_result["entities"]]
+            })
         
         return {
             "intent": intent_result,
@@ -67,24 +298,97 @@ class NLPService:
             "original_text": text
         }
     
-    def update_context(self, current_context: Dict[str, Any], new_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Update the conversation context with new information."""
-        if not current_context:
-            current_context = {
-                "intent_history": [],
-                "entity_history": [],
-                "current_intent": None,
-                "current_entities": None
-            }
+    def _classify_with_ner(self, text: str, timer: StageTimer) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Classify a message the gazetteer found nothing in, running NER only if its intent needs it.
+        
+        When the planner speculates, NER is queued before classification so
+        the two batches run side by side; its result is dropped if the intent
+        turns out not to need it. That needs the NER batch scheduler, so
+        without batching the stages always run one after the other.
+        """
+        if NLP_BATCHING_ENABLED and self.planner.speculate():
+            started = time.perf_counter()
+            ner_future = self.ner_scheduler.submit(text)
+            ner_finished: List[float] = []
+            ner_future.add_done_callback(lambda _: ner_finished.append(time.perf_counter()))
+            with timer.stage("intent_classification"):
+                intent_result = self.classify_intent(text)
+            classified = time.perf_counter()
+            intent = intent_result["intent"]
+            if not self.planner.needs_ner(intent):
+                self.planner.record(intent, "discarded")
+                return intent_result, []
+            
+            with timer.stage("ner"):
+                raw_entities = ner_future.result()
+            finished = time.perf_counter()
+            ner_seconds = (ner_finished[0] if ner_finished else finished) - started
+            # Back-to-back would have cost classification plus NER; overlapping cost only the wall time
+            overlap = (classified - started) + ner_seconds - (finished - started)
+            self.planner.record(intent, "ran", ner_seconds, max(0.0, overlap))
+            return intent_result, self._map_ner_entities(raw_entities)
+        
+        with timer.stage("intent_classification"):
+            intent_result = self.classify_intent(text)
+        intent = intent_result["intent"]
+        if not self.planner.needs_ner(intent):
+            self.planner.record(intent, "skipped")
+            return intent_result, []
         
-        current_context["intent_history"].append(new_info["intent"])
-        current_context["entity_history"].append(new_info["entities"])
-        current_context["current_intent"] = new_info["intent"]
-        current_context["current_entities"] = new_info["entities"]
+        started = time.perf_counter()
+        with timer.stage("ner"):
+            entities = self._run_ner(text)
+        self.planner.record(intent, "ran", time.perf_counter() - started)
+        return intent_result, entities
+    
+    def process_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Process many messages together, bypassing the result cache and schedulers.
         
-        # Keep only the last 5 turns of context
-        if len(current_context["intent_history"]) > 5:
-            current_context["intent_history"] = current_context["intent_history"][-5:]
-            current_context["entity_history"] = current_context["entity_history"][-5:]
+        Meant for offline jobs: one encoder pass for every text, and one NER
+        pass for the texts the gazetteer found nothing in whose intent needs
+        NER labels. Results have the same shape as ``process_message``.
+        """
+        if not texts:
+            return []
+        intents = self._classify_batch(texts)
+        entities = [self._match_entities(text) for text in texts]
+        if NER_FALLBACK_ENABLED:
+            missing = [
+                i for i, found in enumerate(entities)
+                if not found and self.planner.needs_ner(intents[i]["intent"])
+            ]
+            if missing:
+                raw_batches = self._extract_batch([texts[i] for i in missing])
+                for i, raw_entities in zip(missing, raw_batches):
+                    entities[i] = self._map_ner_entities(raw_entities)
+        return [
+            {
+                "intent": intent_result,
+                "entities": {"entities": found, "text": text},
+                "original_text": text
+            }
+            for text, intent_result, found in zip(texts, intents, entities)
+        ]
+    
+    def warm_up(self, text: str) -> None:
+        """Run every enabled model once so that no request pays first-call cost."""
+        self.process_message(text)
+        if NER_FALLBACK_ENABLED:
+            self._run_ner(text)
+    
+    def new_context(self, stored: Optional[str] = None) -> ConversationContext:
+        """Decode a stored conversation context (compact or legacy JSON) for this service."""
+        return ConversationContext.decode(stored, self.context_vocabulary)
+    
+    def update_context(self, current_context: ConversationContext, new_info: Dict[str, Any]) -> ConversationContext:
+        """Update the conversation context with new information.
         
-        return current_context 
\ No newline at end of file
+        Only the intent, its confidence and the entity label/value pairs are
+        kept; the ring buffer holds the last few turns.
+        """
+        current_context.append(
+            new_info["intent"]["intent"],
+            new_info["intent"]["confidence"],
+            [(e["entity"], e["word"]) for e in new_info["entities"]["entities"]]
+        )
+        return current_context
@@ -0,0 +1,122 @@
+from typing import Dict, Any, FrozenSet, Iterable, Optional
+from collections import Counter, defaultdict
+import threading
+from .intent_index import UNKNOWN_INTENT
+
+# Entity labels each intent's response reads; intents missing here are assumed to need all of them
+INTENT_ENTITIES: Dict[str, FrozenSet[str]] = {
+    "academic_info": frozenset({"departments"}),
+    "registration": frozenset({"time_periods"}),
+    "financial_aid": frozenset(),
+    "campus_location": frozenset({"buildings"}),
+    "faculty_info": frozenset({"departments", "faculty_roles"}),
+    "events": frozenset({"events", "time_periods"}),
+    "student_services": frozenset({"services"}),
+    "housing": frozenset(),
+    # The fallback searches the raw text instead
+    UNKNOWN_INTENT: frozenset()
+}
+
+PIPELINE_MODES = ("sequential", "concurrent", "auto")
+
+class PipelinePlanner:
+    """Decides per message whether the NER fallback runs, and whether it overlaps intent classification.
+
+    NER only produces ``ner_labels``, so it is skipped when the predicted
+    intent needs none of them. "sequential" classifies first and runs NER
+    only if needed, which saves model time. "concurrent" starts NER
+    alongside classification and drops the result if it turns out unneeded,
+    which saves latency. "auto" speculates only while the recent share of
+    messages needing NER is at least ``speculate_above``.
+
+    Skipping NER never changes the reply, but the skipped message's NER
+    entities (including PER and MISC) are then missing from the stored
+    conversation context. ``keep_context_entities`` runs NER for every
+    intent, for deployments that read those entities back.
+    """
+
+    def __init__(
+        self,
+        ner_labels: Iterable[str],
+        mode: str = "auto",
+        speculate_above: float = 0.5,
+        requirements: Optional[Dict[str, FrozenSet[str]]] = None,
+        keep_context_entities: bool = False
+    ):
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown NLP pipeline mode {mode!r}; expected one of {', '.join(PIPELINE_MODES)}")
+        self.ner_labels = frozenset(ner_labels)
+        self.mode = mode
+        self.speculate_above = speculate_above
+        self.requirements = INTENT_ENTITIES if requirements is None else requirements
+        self.keep_context_entities = keep_context_entities
+        self._lock = threading.Lock()
+        self._need_share = 1.0
+        self._ner_seconds: Optional[float] = None
+        self._counts: Dict[str, Counter] = defaultdict(Counter)
+        self._saved_seconds: Counter = Counter()
+        self._overlap_seconds: Counter = Counter()
+
+    def needs_ner(self, intent: str) -> bool:
+        if self.keep_context_entities:
+            return True
+        required = self.requirements.get(intent)
+        return required is None or bool(required & self.ner_labels)
+
+    def speculate(self) -> bool:
+        """Whether to start NER before the intent is known."""
+        if self.mode == "auto":
+            return self._need_share >= self.speculate_above
+        return self.mode == "concurrent"
+
+    def record(
+        self,
+        intent: str,
+        outcome: str,
+        ner_seconds: Optional[float] = None,
+        overlap_seconds: float = 0.0
+    ) -> None:
+        """Count one message whose gazetteer pass came up empty.
+
+        ``outcome`` is "ran" (NER was needed), "skipped" (not needed, never
+        started) or "discarded" (started speculatively, then not needed).
+        """
+        with self._lock:
+            self._counts[intent][outcome] += 1
+            needed = outcome == "ran"
+            self._need_share = 0.9 * self._need_share + 0.1 * (1.0 if needed else 0.0)
+            if ner_seconds is not None:
+                self._ner_seconds = ner_seconds if self._ner_seconds is None else 0.9 * self._ner_seconds + 0.1 * ner_seconds
+            if outcome == "skipped" and self._ner_seconds is not None:
+                # Estimated from the recent NER latency; nothing ran to measure
+                self._saved_seconds[intent] += self._ner_seconds
+            self._overlap_seconds[intent] += overlap_seconds
+
+    def record_gazetteer_hit(self, intent: str) -> None:
+        """Count a message the gazetteer answered, so NER was never considered."""
+        with self._lock:
+            self._counts[intent]["gazetteer"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            intents = {
+                intent: {
+                    "gazetteer": counts["gazetteer"],
+                    "ner_ran": counts["ran"],
+                    "ner_skipped": counts["skipped"],
+                    "ner_discarded": counts["discarded"],
+                    "ner_saved_ms": self._saved_seconds[intent] * 1000,
+                    "overlap_saved_ms": self._overlap_seconds[intent] * 1000
+                }
+                for intent, counts in sorted(self._counts.items())
+            }
+            return {
+                "mode": self.mode,
+                "keep_context_entities": self.keep_context_entities,
+                "speculating": self.speculate(),
+                "ner_needed_share": self._need_share,
+                "ner_ms": self._ner_seconds * 1000 if self._ner_seconds is not None else None,
+                "ner_saved_ms": sum(self._saved_seconds.values()) * 1000,
+                "overlap_saved_ms": sum(self._overlap_seconds.values()) * 1000,
+                "intents": intents
+            }
@@ -0,0 +1,86 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from datetime import datetime
+import time
+from ..core.config import SESSION_IDLE_SECONDS, SESSION_TABLE_MAX_ENTRIES
+from .conversation_context import ConversationContext
+
+class ActiveSession:
+    """A user's current conversation, kept in memory between turns."""
+
+    __slots__ = ("conversation_id", "context", "last_activity", "last_seen")
+
+    def __init__(self, conversation_id: int, context: ConversationContext, last_activity: datetime):
+        self.conversation_id = conversation_id
+        self.context = context
+        self.last_activity = last_activity
+        self.last_seen = time.monotonic()
+
+class SessionTable:
+    """Bounded map of user_id to active session with idle-timeout eviction.
+
+    Only touched from the event loop, so it needs no locking. An evicted
+    session is rebuilt from the database on the user's next turn.
+    """
+
+    def __init__(self, max_entries: int = 50000, idle_timeout_seconds: float = 1800):
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout_seconds
+        self._sessions: "OrderedDict[int, ActiveSession]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.idle_evictions = 0
+        self.capacity_evictions = 0
+
+    def get(self, user_id: int) -> Optional[ActiveSession]:
+        session = self._sessions.get(user_id)
+        if session is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - session.last_seen > self.idle_timeout:
+            del self._sessions[user_id]
+            self.idle_evictions += 1
+            self.misses += 1
+            return None
+        self._sessions.move_to_end(user_id)
+        self.hits += 1
+        return session
+
+    def put(self, user_id: int, session: ActiveSession) -> None:
+        session.last_seen = time.monotonic()
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+            self.capacity_evictions += 1
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle longer than the timeout; the oldest are at the front."""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = 0
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_seen > cutoff:
+                break
+            del self._sessions[user_id]
+            evicted += 1
+        self.idle_evictions += evicted
+        return evicted
+
+    def clear(self) -> None:
+        self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._sessions),
+            "max_entries": self.max_entries,
+            "idle_timeout_seconds": self.idle_timeout,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "idle_evictions": self.idle_evictions,
+            "capacity_evictions": self.capacity_evictions
+        }
+
+session_table = SessionTable(SESSION_TABLE_MAX_ENTRIES, SESSION_IDLE_SECONDS)
@@ -0,0 +1,144 @@
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+import json
+import re
+from ..core.config import CAMPUS_TIMEZONE, DATA_DIR
+from .gazetteer import normalize
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MONTHS = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december"
+)
+
+# Longest "next N days" window; larger counts are clamped to it
+MAX_RANGE_DAYS = 366
+_NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "ten": 10, "fourteen": 14}
+
+@dataclass(frozen=True)
+class TimeWindow:
+    """Half-open [start, end) range in campus time, with the phrase to describe it."""
+    start: datetime
+    end: datetime
+    label: str
+
+def campus_now() -> datetime:
+    """Current naive campus time, the clock event start and end times are stored in."""
+    if CAMPUS_TIMEZONE:
+        from zoneinfo import ZoneInfo
+
+        return datetime.now(ZoneInfo(CAMPUS_TIMEZONE)).replace(tzinfo=None)
+    return datetime.now()
+
+def load_calendar(path: Path = DATA_DIR / "entities.json") -> Dict[str, List[Tuple[str, str]]]:
+    """Recurring "MM-DD" ranges of the time_periods entities, keyed by normalized name."""
+    with open(path, "r") as f:
+        time_periods = json.load(f).get("entities", {}).get("time_periods", {})
+    return {
+        normalize(name): [tuple(span) for span in spans]
+        for name, spans in time_periods.get("calendar", {}).items()
+    }
+
+academic_calendar = load_calendar()
+
+def _day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _month_start(year: int, month: int) -> datetime:
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+def _weekday_window(name: str, qualifier: Optional[str], now: datetime) -> TimeWindow:
+    today = _day(now)
+    target = WEEKDAYS.index(name)
+    if qualifier == "next":
+        # The named day of next week
+        start = today - timedelta(days=today.weekday()) + timedelta(days=7 + target)
+    else:
+        start = today + timedelta(days=(target - today.weekday()) % 7)
+    label = f"on {start:%A, %B} {start.day}"
+    return TimeWindow(max(start, now), start + timedelta(days=1), label)
+
+def period_window(name: str, now: datetime, calendar: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Optional[TimeWindow]:
+    """The current or next occurrence of a named academic period, e.g. "Finals Week"."""
+    spans = (academic_calendar if calendar is None else calendar).get(normalize(name))
+    if not spans:
+        return None
+    occurrences = []
+    for first, last in spans:
+        for year in (now.year - 1, now.year, now.year + 1):
+            start = datetime.strptime(f"{year}-{first}", "%Y-%m-%d")
+            end = datetime.strptime(f"{year}-{last}", "%Y-%m-%d") + timedelta(days=1)
+            if end <= start:
+                # Spans the new year, e.g. winter break
+                end = end.replace(year=year + 1)
+            if end > now:
+                occurrences.append((start, end))
+    if not occurrences:
+        return None
+    start, end = min(occurrences)
+    return TimeWindow(max(start, now), end, f"during {name}")
+
+def parse_time_expression(text: str, now: datetime, lookahead_days: float = 14) -> Optional[TimeWindow]:
+    """Resolve a relative time phrase in a message to a window of campus time.
+
+    Understands today, tonight, tomorrow, this/next week, (this/next)
+    weekend, weekday names, this/next month, month names, "in/next N days"
+    and upcoming/soon. Returns None when the message names no time.
+    """
+    phrase = f" {normalize(text)} "
+    today = _day(now)
+    week_start = today - timedelta(days=today.weekday())
+
+    if " tonight " in phrase or " this evening " in phrase:
+        return TimeWindow(max(now, today + timedelta(hours=17)), today + timedelta(days=1), "tonight")
+    if " today " in phrase:
+        return TimeWindow(now, today + timedelta(days=1), "today")
+    if " tomorrow " in phrase:
+        start = today + timedelta(days=1)
+        return TimeWindow(start, start + timedelta(days=1), "tomorrow")
+
+    match = re.search(r" (this|next|coming)? ?weekend ", phrase)
+    if match:
+        saturday = week_start + timedelta(days=5)
+        if match.group(1) == "next":
+            saturday += timedelta(days=7)
+        return TimeWindow(max(now, saturday), saturday + timedelta(days=2), f"{match.group(1) or 'this'} weekend")
+
+    match = re.search(r" (this|next|coming) week ", phrase)
+    if match:
+        if match.group(1) == "next":
+            return TimeWindow(week_start + timedelta(days=7), week_start + timedelta(days=14), "next week")
+        return TimeWindow(now, week_start + timedelta(days=7), "this week")
+
+    match = re.search(r" (?:(this|next|on) )?(" + "|".join(WEEKDAYS) + r")s? ", phrase)
+    if match:
+        return _weekday_window(match.group(2), match.group(1), now)
+
+    match = re.search(r" (this|next) month ", phrase)
+    if match:
+        offset = 1 if match.group(1) == "next" else 0
+        start = _month_start(now.year, now.month + offset)
+        return TimeWindow(max(now, start), _month_start(now.year, now.month + offset + 1), f"{match.group(1)} month")
+
+    match = re.search(r" (?:in|during) (" + "|".join(MONTHS) + ") ", phrase)
+    if match:
+        month = MONTHS.index(match.group(1)) + 1
+        start = _month_start(now.year + (1 if month < now.month else 0), month)
+        return TimeWindow(max(now, start), _month_start(start.year, month + 1), f"in {start:%B}")
+
+    match = re.search(r" (?:in|next|within) (?:the next )?(\d+|" + "|".join(_NUMBER_WORDS) + r") days? ", phrase)
+    if match:
+        number = match.group(1)
+        # Checked before int() so a huge digit string never reaches the date arithmetic
+        count = _NUMBER_WORDS.get(number) or (int(number) if len(number) <= 3 else MAX_RANGE_DAYS)
+        count = min(count, MAX_RANGE_DAYS)
+        try:
+            return TimeWindow(now, today + timedelta(days=count + 1), f"in the next {count} days")
+        except OverflowError:
+            return None
+
+    if re.search(r" (upcoming|coming up|soon|happening|going on) ", phrase):
+        return TimeWindow(now, now + timedelta(days=lookahead_days), "coming up")
+    return None
@@ -0,0 +1,32 @@
+import asyncio
+import os
+import tempfile
+import pytest
+
+# The models module creates its engines at import time, so point them at a scratch SQLite file first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="chatbot-tests-"), "test.db")
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+@pytest.fixture
+def database():
+    """Fresh tables for one test; yields the sync engine."""
+    from backend.models.base import Base, engine
+    from backend.models import knowledge, user  # noqa: F401 -- registers the tables
+
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a new event loop, closing pooled async connections before the loop ends."""
+    from backend.models.base import async_engine
+
+    def run(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
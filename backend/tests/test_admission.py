@@ -0,0 +1,144 @@
+import asyncio
+import json
+import pytest
+from backend.api import chat
+from backend.services import admission
+from backend.services.admission import AdmissionController, Overloaded, TokenBucketLimiter
+
+def test_sheds_when_the_queue_is_full():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout_ms=1000)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        waiter = asyncio.ensure_future(hold())
+        while (controller.in_flight, controller.queued) != (1, 1):
+            await asyncio.sleep(0.001)
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return shed.value
+
+    shed = asyncio.run(scenario())
+    assert shed.reason == "queue_full"
+    assert shed.retry_after >= 1
+    stats = controller.stats()
+    assert (stats["shed_queue_full"], stats["admitted"], stats["in_flight"], stats["queued"]) == (1, 2, 0, 0)
+
+def test_sheds_after_the_queue_timeout():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_ms=20)
+
+    async def scenario():
+        started = await controller.acquire()
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        controller.release(started)
+        # The slot freed by the holder is still usable after the timed-out waiter gave up
+        async with controller.admit():
+            pass
+        return shed.value
+
+    assert asyncio.run(scenario()).reason == "queue_timeout"
+    stats = controller.stats()
+    assert (stats["shed_timeout"], stats["admitted"], stats["in_flight"], stats["queued"]) == (1, 2, 0, 0)
+
+def test_slot_is_released_when_the_turn_raises():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout_ms=20)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                raise RuntimeError("model failed")
+        assert controller.in_flight == 0
+        async with controller.admit():
+            assert controller.in_flight == 1
+
+    asyncio.run(scenario())
+    assert controller.stats()["shed_queue_full"] == 0
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_allows_a_burst_then_refills(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=3)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [None, None, None]
+    assert limiter.acquire("a") == pytest.approx(1.0)
+    # Other keys have their own bucket
+    assert limiter.acquire("b") is None
+
+    clock.now += 0.5
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.acquire("a") is None
+
+    # Refill is capped at the burst size
+    clock.now += 60
+    assert [limiter.acquire("a") for _ in range(4)][-1] == pytest.approx(1.0)
+    assert (limiter.allowed, limiter.limited) == (8, 3)
+
+def test_token_bucket_evicts_the_least_recently_used_key(monkeypatch):
+    monkeypatch.setattr(admission.time, "monotonic", FakeClock())
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1, max_keys=2)
+
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")
+    limiter.acquire("c")
+    assert list(limiter._buckets) == ["a", "c"]
+    # "b" was forgotten, so it starts again with a full bucket
+    assert limiter.acquire("b") is None
+
+def test_disabled_token_bucket_never_limits():
+    limiter = TokenBucketLimiter(rate_per_minute=0, burst=1)
+    assert all(limiter.acquire("a") is None for _ in range(10))
+
+class FakeChatService:
+    def __init__(self, db, nlp_service):
+        pass
+
+    async def stream_message(self, user_id, text):
+        yield {"event": "typing", "intent": "greeting"}
+        yield {"event": "message", "response": {"text": "Hello"}}
+
+def test_sse_stream_only_holds_a_slot_while_it_runs(monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout_ms=20)
+    monkeypatch.setattr(chat, "admission_controller", controller)
+    monkeypatch.setattr(chat, "ChatService", FakeChatService)
+
+    async def scenario():
+        # A response that is never iterated (client gone before the body started) takes no slot
+        abandoned = chat._sse_events(None, 1, "hi")
+        assert controller.in_flight == 0
+        await abandoned.aclose()
+
+        # A client that disconnects mid-stream gives its slot back
+        stream = chat._sse_events(None, 1, "hi")
+        assert (await stream.__anext__()).startswith("event: typing\n")
+        assert controller.in_flight == 1
+
+        # While it is held, another stream is told to retry instead of waiting
+        busy = [event async for event in chat._sse_events(None, 2, "hi")]
+        await stream.aclose()
+        assert controller.in_flight == 0
+
+        return busy, [event async for event in chat._sse_events(None, 1, "hi")]
+
+    busy, events = asyncio.run(scenario())
+    assert len(busy) == 1 and busy[0].startswith("event: error\n")
+    error = json.loads(busy[0].split("data: ", 1)[1])
+    assert (error["status"], error["retry_after"] >= 1) == (503, True)
+    assert [event.split("\n", 1)[0] for event in events] == ["event: typing", "event: message"]
+    assert controller.in_flight == 0
@@ -0,0 +1,52 @@
+import json
+import pytest
+from backend.services.conversation_context import MAX_TURNS, ContextVocabulary, ConversationContext
+
+VOCABULARY = ContextVocabulary(
+    [f"intent_{i}" for i in range(10)] + ["campus_location"],
+    ["buildings"],
+    ["Library"]
+)
+
+def test_ring_keeps_the_latest_turns_across_encoding():
+    context = ConversationContext(VOCABULARY)
+    for i in range(MAX_TURNS + 2):
+        context.append(f"intent_{i}", 0.5, [])
+    expected = [f"intent_{i}" for i in range(2, MAX_TURNS + 2)]
+    assert [turn["intent"] for turn in context.turns()] == expected
+
+    decoded = ConversationContext.decode(context.encode(), VOCABULARY)
+    assert [turn["intent"] for turn in decoded.turns()] == expected
+    decoded.append("intent_9", 1.0, [("buildings", "Library")])
+    assert decoded.current_intent == "intent_9"
+    assert decoded.turns()[0]["intent"] == "intent_3"
+    assert decoded.turns()[-1]["entities"] == [{"entity": "buildings", "word": "Library"}]
+
+def test_legacy_json_is_migrated():
+    stored = json.dumps({
+        "intent_history": [{"intent": "campus_location", "confidence": 0.9}],
+        "entity_history": [{"entities": [{"entity": "buildings", "word": "Library"}]}]
+    })
+    context = ConversationContext.decode(stored, VOCABULARY)
+    assert context.current_intent == "campus_location"
+    assert context.turns()[0]["entities"] == [{"entity": "buildings", "word": "Library"}]
+
+@pytest.mark.parametrize("legacy", [
+    ["not", "a", "dict"],
+    {"intent_history": "campus_location", "entity_history": []},
+    {"intent_history": ["campus_location"], "entity_history": [{"entities": []}]},
+    {"intent_history": [{"intent": "campus_location"}], "entity_history": [{"entities": ["Library", 3]}]},
+    {"intent_history": [{"intent": "campus_location"}], "entity_history": [{"entities": "Library"}]},
+    {"intent_history": [{"intent": "campus_location", "confidence": "high"}], "entity_history": [{}]},
+    {"intent_history": [{"intent": "campus_location", "confidence": [1]}], "entity_history": [{}]},
+])
+def test_malformed_legacy_rows_never_raise(legacy):
+    context = ConversationContext.decode(json.dumps(legacy), VOCABULARY)
+    assert all(turn["entities"] == [] for turn in context.turns())
+
+def test_non_numeric_confidence_falls_back_to_empty_context():
+    stored = json.dumps({
+        "intent_history": [{"intent": "campus_location", "confidence": 0.9}, {"intent": "x", "confidence": "high"}],
+        "entity_history": [{}, {}]
+    })
+    assert ConversationContext.decode(stored, VOCABULARY).turns() == []
@@ -0,0 +1,101 @@
+import json
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from sqlalchemy.orm import Session
+from backend.main import app
+from backend.models.user import Conversation, Message, User
+
+START = datetime(2026, 10, 17, 9, 0, 0)
+
+@pytest.fixture
+def conversation(database):
+    """Conversation 1 with messages 1-7; messages 3, 4 and 5 share one timestamp.
+
+    Message 8 belongs to another conversation. Ids are inserted out of
+    timestamp order so the tests see the (timestamp, id) order, not insertion order.
+    """
+    timestamps = {
+        1: START,
+        2: START + timedelta(seconds=1),
+        5: START + timedelta(seconds=2),
+        3: START + timedelta(seconds=2),
+        4: START + timedelta(seconds=2),
+        6: START + timedelta(seconds=3),
+        7: START + timedelta(seconds=4)
+    }
+    with Session(database) as db:
+        db.add(User(id=1, email="student@example.edu"))
+        db.add_all([Conversation(id=1, user_id=1), Conversation(id=2, user_id=1)])
+        db.flush()
+        for message_id, timestamp in timestamps.items():
+            db.add(Message(
+                id=message_id, conversation_id=1, content=f"message {message_id}",
+                is_user=message_id % 2 == 1, timestamp=timestamp
+            ))
+        db.add(Message(id=8, conversation_id=2, content="elsewhere", is_user=True, timestamp=START))
+        db.commit()
+    return 1
+
+@pytest.fixture
+def get(run):
+    def get(path, **params):
+        async def request():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get(path, params=params)
+        return run(request())
+    return get
+
+def ids(page):
+    return [message["id"] for message in page["messages"]]
+
+def test_pages_forward_through_timestamp_ties(conversation, get):
+    first = get("/api/conversation/1", limit=3).json()
+    assert ids(first) == [1, 2, 3]
+    assert (first["prev_before"], first["next_after"]) == (None, 3)
+
+    second = get("/api/conversation/1", after=first["next_after"], limit=3).json()
+    assert ids(second) == [4, 5, 6]
+    assert (second["prev_before"], second["next_after"]) == (4, 6)
+
+    last = get("/api/conversation/1", after=second["next_after"], limit=3).json()
+    assert ids(last) == [7]
+    assert (last["prev_before"], last["next_after"]) == (7, None)
+
+def test_pages_backward_through_timestamp_ties(conversation, get):
+    newest = get("/api/conversation/1", before=7, limit=3).json()
+    assert ids(newest) == [4, 5, 6]
+    assert (newest["prev_before"], newest["next_after"]) == (4, 6)
+
+    older = get("/api/conversation/1", before=newest["prev_before"], limit=3).json()
+    assert ids(older) == [1, 2, 3]
+    assert (older["prev_before"], older["next_after"]) == (None, 3)
+
+    # Forward from the end of that page lands back on the same messages
+    assert ids(get("/api/conversation/1", after=older["next_after"], limit=3).json()) == [4, 5, 6]
+
+def test_pages_stop_exactly_at_the_boundaries(conversation, get):
+    whole = get("/api/conversation/1", limit=7).json()
+    assert ids(whole) == [1, 2, 3, 4, 5, 6, 7]
+    assert (whole["prev_before"], whole["next_after"]) == (None, None)
+
+    assert get("/api/conversation/1", before=1).json()["messages"] == []
+    past_end = get("/api/conversation/1", after=7).json()
+    assert (past_end["messages"], past_end["next_after"], past_end["prev_before"]) == ([], None, None)
+
+def test_rejects_bad_cursors(conversation, get):
+    assert get("/api/conversation/1", before=3, after=5).status_code == 400
+    # Message 8 exists, but in another conversation
+    assert get("/api/conversation/1", after=8).status_code == 400
+    assert get("/api/conversation/99").status_code == 404
+
+def test_exports_the_conversation_as_ndjson(conversation, get):
+    response = get("/api/conversation/1/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5, 6, 7]
+    assert rows[2] == {
+        "id": 3, "content": "message 3", "is_user": True, "timestamp": (START + timedelta(seconds=2)).isoformat()
+    }
+    assert get("/api/conversation/99/export").status_code == 404
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from datetime import datetime
+import httpx
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from backend.models.base import AsyncSessionLocal
+from backend.models.user import Conversation, Message, User
+from backend.services.message_writer import MessageIdAllocator, MessageWriter, PendingTurn
+
+def seed(engine, conversations=(1,), messages=()):
+    with Session(engine) as db:
+        db.add(User(id=1, email="student@example.edu"))
+        for conversation_id in conversations:
+            db.add(Conversation(id=conversation_id, user_id=1, context=None))
+        for message_id in messages:
+            db.add(Message(id=message_id, conversation_id=conversations[0], content="old", is_user=True))
+        db.commit()
+
+def turn(n, conversation_id=1, user_message_id=None):
+    return PendingTurn(
+        conversation_id=conversation_id,
+        user_message_id=user_message_id or 2 * n + 1,
+        bot_message_id=2 * n + 2,
+        user_text=f"question {n}",
+        bot_text=f"answer {n}",
+        context=f"context {n}",
+        timestamp=datetime(2026, 10, 17, 9, 0, n),
+        enqueued_at=time.monotonic()
+    )
+
+def stored(engine):
+    with Session(engine) as db:
+        messages = db.execute(select(Message.id, Message.content).order_by(Message.id)).all()
+        contexts = dict(db.execute(select(Conversation.id, Conversation.context)).all())
+    return messages, contexts
+
+def test_flushes_in_batches(database, run):
+    seed(database)
+    writer = MessageWriter(AsyncSessionLocal, max_batch=2, max_delay_ms=60000)
+
+    async def scenario():
+        for n in range(5):
+            await writer.submit(turn(n))
+        await writer.flush()
+        await writer.stop()
+
+    run(scenario())
+    messages, contexts = stored(database)
+    assert [message_id for message_id, _ in messages] == list(range(1, 11))
+    assert contexts[1] == "context 4"
+    stats = writer.stats()
+    assert stats["turns_written"] == 5
+    assert stats["batch_size_counts"] == {1: 1, 2: 2}
+    assert stats["queued_turns"] == 0
+
+def test_writes_a_lone_turn_after_max_delay(database, run):
+    seed(database)
+    writer = MessageWriter(AsyncSessionLocal, max_batch=200, max_delay_ms=10)
+
+    async def scenario():
+        await writer.submit(turn(0))
+        for _ in range(100):
+            if writer.turns_written:
+                break
+            await asyncio.sleep(0.01)
+        written = writer.turns_written
+        await writer.stop()
+        return written
+
+    assert run(scenario()) == 1
+
+def test_transient_error_is_retried(database, run):
+    seed(database)
+    writer = MessageWriter(AsyncSessionLocal, max_batch=200, max_delay_ms=10)
+    write = writer._write
+    failures = []
+
+    async def flaky_write(batch):
+        if not failures:
+            failures.append(len(batch))
+            raise OperationalError("INSERT", {}, ConnectionError("connection reset"))
+        await write(batch)
+
+    writer._write = flaky_write
+
+    async def scenario():
+        await writer.submit(turn(0))
+        for _ in range(200):
+            if writer.turns_written:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+
+    run(scenario())
+    assert failures == [1]
+    assert writer.stats()["failed_flushes"] == 1
+    assert writer.stats()["turns_dropped"] == 0
+    assert len(stored(database)[0]) == 2
+
+def test_permanent_error_drops_only_the_bad_turn(database, run):
+    # Message 3 already exists, so the turn reusing it violates the primary key on every attempt
+    seed(database, messages=[3])
+    writer = MessageWriter(AsyncSessionLocal, max_batch=200, max_delay_ms=60000, max_attempts=3)
+
+    async def scenario():
+        await writer.submit(turn(0))
+        await writer.submit(turn(1, user_message_id=3))
+        await writer.submit(turn(2))
+        for _ in range(3):
+            await writer.flush()
+        await writer.stop()
+
+    run(scenario())
+    messages, _ = stored(database)
+    assert [message_id for message_id, _ in messages] == [1, 2, 3, 5, 6]
+    assert dict(messages)[3] == "old"
+    stats = writer.stats()
+    assert stats["turns_written"] == 2
+    assert stats["turns_dropped"] == 1
+    assert stats["queued_turns"] == 0
+    assert not writer.is_pending(4)
+
+def test_stop_drains_queued_turns(database, run):
+    seed(database, conversations=(1, 2))
+    writer = MessageWriter(AsyncSessionLocal, max_batch=200, max_delay_ms=60000)
+
+    async def scenario():
+        await writer.submit(turn(0, conversation_id=1))
+        await writer.submit(turn(1, conversation_id=2))
+        await writer.submit(turn(2, conversation_id=1))
+        assert writer.has_pending_conversation(2)
+        await writer.stop()
+
+    run(scenario())
+    messages, contexts = stored(database)
+    assert len(messages) == 6
+    assert contexts == {1: "context 2", 2: "context 1"}
+    assert not writer.has_pending_conversation(2)
+
+def test_feedback_on_a_message_that_is_not_flushed_yet(database, run):
+    from backend.main import app
+    from backend.services.message_writer import message_writer
+
+    from backend.models.user import Feedback
+
+    seed(database)
+    max_delay = message_writer.max_delay
+
+    async def scenario():
+        # Queued, not written: the background flusher waits for its max delay
+        message_writer.max_delay = 60.0
+        await message_writer.submit(turn(0))
+        assert message_writer.is_pending(2)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/feedback/2", params={"rating": 5})
+        await message_writer.stop()
+        return response
+
+    try:
+        response = run(scenario())
+    finally:
+        message_writer.max_delay = max_delay
+    assert response.status_code == 200
+    assert not message_writer.is_pending(2)
+    with Session(database) as db:
+        assert [(f.message_id, f.rating) for f in db.query(Feedback)] == [(2, 5)]
+
+def test_id_allocation_continues_from_max_id(database, run):
+    seed(database, messages=[7, 41])
+    allocator = MessageIdAllocator()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            first = await allocator.allocate(db, 3)
+            second = await allocator.allocate(db, 1)
+        return first, second
+
+    assert run(scenario()) == ([42, 43, 44], [45])
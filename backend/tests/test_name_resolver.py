@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+import pytest
+from backend.services.gazetteer import Gazetteer, domain_terms
+from backend.services.name_resolver import NameResolver
+
+ENTITIES_PATH = Path(__file__).parent.parent / "data" / "entities.json"
+
+@pytest.fixture(scope="module")
+def terms():
+    with open(ENTITIES_PATH, "r") as f:
+        return domain_terms(json.load(f))
+
+@pytest.fixture(scope="module")
+def resolver(terms):
+    resolver = NameResolver()
+    for label, phrases in terms.items():
+        for surface, canonical in phrases:
+            resolver.add(label, surface, canonical)
+    return resolver
+
+def test_resolves_misspelled_name(resolver):
+    target, score = resolver.resolve("buildings", "libary", limit=1)[0]
+    assert target == "Library"
+    assert score >= 0.6
+
+def test_scan_finds_typo_the_gazetteer_misses(terms, resolver):
+    text = "Where is the libary?"
+    assert Gazetteer(terms).match(text) == []
+
+    spans = resolver.scan(text, min_score=0.6)
+    assert [(label, target) for _, _, label, target, _ in spans] == [("buildings", "Library")]
+    start, end = spans[0][:2]
+    assert text[start:end] == "libary"
+
+def test_scan_matches_multiword_names(resolver):
+    spans = resolver.scan("Tell me about the computr science department", min_score=0.6)
+    assert ("departments", "Computer Science") in [(label, target) for _, _, label, target, _ in spans]
+
+def test_scan_requires_same_word_count(resolver):
+    # "semester" alone is part of "Fall Semester", not a misspelling of it
+    assert resolver.scan("when is the semester over", min_score=0.6) == []
+
+def test_scan_ignores_unrelated_text(resolver):
+    assert resolver.scan("hello there, what time is it", min_score=0.6) == []
+
+def test_removed_terms_no_longer_resolve():
+    resolver = NameResolver()
+    resolver.add("buildings", "Library", "Library")
+    assert resolver.remove("buildings", "Library", "Library")
+    assert resolver.resolve("buildings", "libary") == []
+    assert resolver.sync([("buildings", "Library", "Library")]) == (1, 0)
+    assert resolver.resolve("buildings", "libary", limit=1)[0][0] == "Library"
+
+def test_compaction_keeps_remaining_terms_resolvable():
+    resolver = NameResolver()
+    names = ["Library", "Bay Hall", "Center for the Arts", "Natural Resources Center", "University Center"]
+    for name in names:
+        resolver.add("buildings", name, name)
+    for name in names[:3]:
+        resolver.remove("buildings", name, name)
+    # More tombstones than live terms triggers a compaction
+    assert resolver.stats()["tombstones"] == 0
+    assert resolver.resolve("buildings", "univrsity center", limit=1)[0][0] == "University Center"
+    assert resolver.resolve("buildings", "libary") == []
+
+def test_copy_is_independent_of_the_original():
+    original = NameResolver()
+    original.add("buildings", "Library", "Library")
+    clone = original.copy()
+    clone.sync([("buildings", "Main Library", "Main Library")])
+    assert original.resolve("buildings", "libary", limit=1)[0][0] == "Library"
+    assert [target for target, _ in clone.resolve("buildings", "main libary")] == ["Main Library"]
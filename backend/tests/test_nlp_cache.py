@@ -0,0 +1,38 @@
+from backend.services.nlp_cache import NLPResultCache, realign_entities
+
+def entity(text, phrase, source, word=None):
+    start = text.index(phrase)
+    return {
+        "entity": "buildings", "word": word or phrase, "score": 1.0,
+        "start": start, "end": start + len(phrase), "source": source
+    }
+
+def test_entries_are_shared_by_texts_with_the_same_normalized_form():
+    cache = NLPResultCache()
+    cache.set_fingerprint("v1")
+    cache.put("Where is the Main Library?", {"text": "Where is the Main Library?"})
+    assert cache.get("  where IS the main library") == {"text": "Where is the Main Library?"}
+    assert cache.get("where is the main library now") is None
+
+def test_realigns_offsets_and_ner_words_onto_the_new_text():
+    source = "Where is the Main Library?"
+    text = "where   is the MAIN library"
+    entities = [
+        entity(source, "Main Library", "ner"),
+        entity(source, "Library", "gazetteer", word="University Library")
+    ]
+
+    realigned = realign_entities(source, text, entities)
+    assert [(e["start"], e["end"]) for e in realigned] == [(15, 27), (20, 27)]
+    assert text[15:27] == "MAIN library"
+    assert realigned[0]["word"] == "MAIN library"
+    # Canonical names do not depend on how the user typed them
+    assert realigned[1]["word"] == "University Library"
+    # The cached entities are left untouched
+    assert entities[0]["start"] == 13 and entities[0]["word"] == "Main Library"
+
+def test_same_text_returns_plain_copies():
+    source = "Is the library open?"
+    entities = [entity(source, "library", "ner")]
+    realigned = realign_entities(source, source, entities)
+    assert realigned == entities and realigned[0] is not entities[0]
@@ -0,0 +1,17 @@
+from datetime import datetime
+from backend.services.time_expressions import MAX_RANGE_DAYS, parse_time_expression
+
+NOW = datetime(2026, 10, 17, 9, 0)
+
+def test_next_n_days():
+    window = parse_time_expression("events in the next 3 days", NOW)
+    assert window.start == NOW
+    assert window.end == datetime(2026, 10, 21)
+
+def test_huge_day_counts_are_clamped():
+    for count in ("99999999", "9" * 5000):
+        window = parse_time_expression(f"events in the next {count} days", NOW)
+        assert window.label == f"in the next {MAX_RANGE_DAYS} days"
+
+def test_overflowing_window_is_no_time_range():
+    assert parse_time_expression("next 5 days", datetime(9999, 12, 30)) is None
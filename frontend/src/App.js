@@ -12,7 +12,11 @@ import {
   createTheme
 } from '@mui/material';
 import SendIcon from '@mui/icons-material/Send';
-import axios from 'axios';
+
+const API_URL = 'http://localhost:8000/api';
+const WS_URL = 'ws://localhost:8000/api/ws';
+const USER_ID = 1; // In a real app, this would be the actual user ID
+const RECONNECT_DELAY_MS = 2000;
 
 const theme = createTheme({
   palette: {
@@ -29,7 +33,9 @@ function App() {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  const [typingIntent, setTypingIntent] = useState(null);
   const messagesEndRef = useRef(null);
+  const socketRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -39,7 +45,76 @@ function App() {
     scrollToBottom();
   }, [messages]);
 
-  const handleSendMessage = async () => {
+  const addBotMessage = (text) => {
+    setMessages(prev => [...prev, {
+      text,
+      isUser: false,
+      timestamp: new Date().toISOString()
+    }]);
+  };
+
+  const handleEvent = (event) => {
+    if (event.event === 'typing') {
+      setTypingIntent(event.intent);
+      return;
+    }
+    if (event.event === 'message') {
+      addBotMessage(event.response.text);
+    } else {
+      addBotMessage("Sorry, I'm having trouble processing your request. Please try again later.");
+    }
+    setTypingIntent(null);
+    setLoading(false);
+  };
+
+  // One socket carries the whole conversation; reconnect if the server drops it
+  useEffect(() => {
+    let closed = false;
+    let retry = null;
+
+    const connect = () => {
+      const socket = new WebSocket(`${WS_URL}/${USER_ID}`);
+      socket.onmessage = (message) => handleEvent(JSON.parse(message.data));
+      socket.onclose = () => {
+        socketRef.current = null;
+        if (!closed) {
+          retry = setTimeout(connect, RECONNECT_DELAY_MS);
+        }
+      };
+      socket.onopen = () => {
+        socketRef.current = socket;
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      socketRef.current?.close();
+    };
+  }, []);
+
+  // Server-Sent Events fallback while the socket is unavailable
+  const sendOverEventSource = (text) => {
+    const params = new URLSearchParams({ user_id: USER_ID, text });
+    const source = new EventSource(`${API_URL}/message/stream?${params}`);
+    let done = false;
+    source.addEventListener('typing', (message) => handleEvent(JSON.parse(message.data)));
+    source.addEventListener('message', (message) => {
+      done = true;
+      source.close();
+      handleEvent(JSON.parse(message.data));
+    });
+    source.onerror = () => {
+      source.close();
+      if (!done) {
+        console.error('Error streaming message');
+        handleEvent({ event: 'error' });
+      }
+    };
+  };
+
+  const handleSendMessage = () => {
     if (!input.trim()) return;
 
     const userMessage = {
@@ -52,29 +127,11 @@ function App() {
     setInput('');
     setLoading(true);
 
-    try {
-      const response = await axios.post('http://localhost:8000/api/message', {
-        text: input,
-        user_id: 1 // In a real app, this would be the actual user ID
-      });
-
-      const botMessage = {
-        text: response.data.response.text,
-        isUser: false,
-        timestamp: new Date().toISOString()
-      };
-
-      setMessages(prev => [...prev, botMessage]);
-    } catch (error) {
-      console.error('Error sending message:', error);
-      const errorMessage = {
-        text: "Sorry, I'm having trouble processing your request. Please try again later.",
-        isUser: false,
-        timestamp: new Date().toISOString()
-      };
-      setMessages(prev => [...prev, errorMessage]);
-    } finally {
-      setLoading(false);
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ text: input }));
+    } else {
+      sendOverEventSource(input);
     }
   };
 
@@ -128,8 +185,13 @@ function App() {
               </Box>
             ))}
             {loading && (
-              <Box sx={{ display: 'flex', justifyContent: 'flex-start', mb: 2 }}>
+              <Box sx={{ display: 'flex', alignItems: 'center', gap: 1, justifyContent: 'flex-start', mb: 2 }}>
                 <CircularProgress size={20} />
+                {typingIntent && (
+                  <Typography variant="caption" color="text.secondary">
+                    Typing...
+                  </Typography>
+                )}
               </Box>
             )}
             <div ref={messagesEndRef} />